@@ -0,0 +1,74 @@
+"""Food placement cost as the snake fills the board.
+
+Grows a snake along a Hamiltonian cycle of the board and, at several lengths,
+times SnakeEnvironment._place_food next to rejection sampling (redraw until the
+cell is empty), which is what avoiding the body would cost without the free
+cell index.
+
+    python benchmarks/food_placement.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snake import SnakeEnvironment, Action
+from planners import hamiltonian_cycle
+
+CALLS = 20000
+
+
+def cycle_positions(env: SnakeEnvironment, cycle: list) -> list:
+    """(x, y) of every cell of a cycle given as cell indices, as hamiltonian_cycle returns it"""
+    return [(cell % env._width, cell // env._width) for cell in cycle]
+
+
+def grow_snake(env: SnakeEnvironment, score: int, cycle: list):
+    """Feeds the snake every step so it grows along the cycle until it reaches score"""
+    deltas = {(0, -1): Action.UP, (1, 0): Action.RIGHT, (-1, 0): Action.LEFT, (0, 1): Action.DOWN}
+    cycle = cycle_positions(env, cycle)
+    position = cycle.index((env._head_x, env._head_y))
+    while env.score < score:
+        x, y = cycle[position]
+        position = (position + 1) % len(cycle)
+        next_x, next_y = cycle[position]
+        env._food_x, env._food_y = next_x, next_y
+        _, _, lost = env.step(deltas[(next_x - x, next_y - y)])
+        if lost:
+            raise Exception("snake died while filling the board")
+
+
+def follow_cycle(env: SnakeEnvironment, cycle: list) -> list:
+    """Actions that keep the snake on the cycle for one full lap from where its head is"""
+    deltas = {(0, -1): Action.UP, (1, 0): Action.RIGHT, (-1, 0): Action.LEFT, (0, 1): Action.DOWN}
+    cycle = cycle_positions(env, cycle)
+    position = cycle.index((env._head_x, env._head_y))
+    lap = cycle[position:] + cycle[:position + 1]
+    return [deltas[(b[0] - a[0], b[1] - a[1])] for a, b in zip(lap, lap[1:])]
+
+
+def rejection_sample(env: SnakeEnvironment) -> int:
+    head = env._head_y * env._width + env._head_x
+    while True:
+        cell = random.randrange(env._cells)
+        if not env._occupied(cell) and cell != head:
+            return cell
+
+
+def main():
+    random.seed(0)
+    env = SnakeEnvironment(seed=0)
+    cycle = hamiltonian_cycle(*SnakeEnvironment.GRID_SIZE)
+
+    print(f"{'score':>6} {'free cells':>10} {'free index us':>14} {'rejection us':>13}")
+    for score in (0, 50, 100, 200, 300, 350, 390, 398):
+        grow_snake(env, score, cycle)
+        food = (env._food_x, env._food_y)
+        indexed = timeit.timeit(env._place_food, number=CALLS) / CALLS * 1e6
+        rejected = timeit.timeit(lambda: rejection_sample(env), number=CALLS) / CALLS * 1e6
+        env._food_x, env._food_y = food
+        print(f"{env.score:>6} {env._free_count:>10} {indexed:>14.3f} {rejected:>13.3f}")
+
+if __name__ == "__main__":
+    main()
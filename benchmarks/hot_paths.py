@@ -0,0 +1,251 @@
+"""Timings for the simulation, rendering and visualizer hot paths.
+
+Runs headless (dummy SDL video driver) with fixed seeds and writes the results
+as JSON. Passing a baseline compares against it and exits non-zero when any
+benchmark got slower than the tolerance allows.
+
+    python benchmarks/hot_paths.py --output baseline.json
+    python benchmarks/hot_paths.py --baseline baseline.json
+    python benchmarks/hot_paths.py --only step,render
+
+Every benchmark repeats its timed loop a few times. best_us (fastest repeat,
+per call) is what the comparison uses, it is the least sensitive to noise from
+the rest of the machine. Baselines are only meaningful on the machine that
+recorded them.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+import pygame
+import torch
+from snake import SnakeEnvironment
+from nn_visualizer import VisualNN, Neuron
+from planners import hamiltonian_cycle
+from food_placement import grow_snake, follow_cycle
+
+SEED = 0
+LENGTHS = (0, 50, 200, 390)
+ARCHITECTURES = ([12, 8, 8, 4], [12, 16, 16, 4], [12, 24, 24, 24, 4])
+REPEAT = 5
+
+
+def measure(func, number: int, repeat: int = REPEAT) -> dict:
+    """Calls func number times per repeat, returns per call timings in microseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "best_us": min(times),
+        "median_us": statistics.median(times),
+        "calls_per_second": 1e6 / min(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def seed_everything():
+    random.seed(SEED)
+    np.random.seed(SEED)
+    torch.manual_seed(SEED)
+
+
+def snake_of_length(length: int) -> tuple:
+    """A snake grown along the board's Hamiltonian cycle, plus the actions that keep it on
+    the cycle. Food is moved off the board so stepping never changes its length."""
+    env = SnakeEnvironment(seed=SEED)
+    cycle = hamiltonian_cycle(*SnakeEnvironment.GRID_SIZE)
+    grow_snake(env, length, cycle)
+    env._food_x, env._food_y = -1, -1
+    return env, follow_cycle(env, cycle)
+
+
+def bench_step(results: dict):
+    for length in LENGTHS:
+        env, lap = snake_of_length(length)
+        actions = iter(lap * (1 + 20000 // len(lap)))
+        results[f"step/length={length}"] = measure(lambda: env.step(next(actions)), number=2000)
+
+
+def bench_reset(results: dict):
+    cycle = hamiltonian_cycle(*SnakeEnvironment.GRID_SIZE)
+    for length in LENGTHS:
+        env = SnakeEnvironment(seed=SEED)
+        # reset is O(length), so regrow the snake before every timed call
+        times = []
+        for _ in range(50):
+            grow_snake(env, length, cycle)
+            start = time.perf_counter()
+            env.reset()
+            times.append((time.perf_counter() - start) * 1e6)
+        results[f"reset/length={length}"] = {
+            "best_us": min(times),
+            "median_us": statistics.median(times),
+            "calls_per_second": 1e6 / min(times),
+            "number": 1,
+            "repeat": len(times),
+        }
+
+
+def bench_action_mask(results: dict):
+    for length in LENGTHS:
+        env, _ = snake_of_length(length)
+        for lookahead in (0, 64):
+            # dropping the cached masks times the computation, not the lookup
+            def action_mask():
+                env._masks = {}
+                return env.action_mask(lookahead)
+            results[f"action_mask/length={length},lookahead={lookahead}"] = measure(action_mask, number=2000)
+
+
+def bench_render(results: dict):
+    for length in LENGTHS:
+        env, lap = snake_of_length(length)
+        env.render_frame()
+        results[f"render_frame/length={length}"] = measure(env.render_frame, number=200)
+
+        # what the game loop pays per frame: one step plus repainting the cells it touched
+        actions = iter(lap * (1 + 5000 // len(lap)))
+        env.render_dirty_frame()
+
+        def step_and_render():
+            env.step(next(actions))
+            env.render_dirty_frame()
+
+        results[f"step_render_dirty/length={length}"] = measure(step_and_render, number=500)
+
+
+def bench_visual_forward(results: dict):
+    for architecture in ARCHITECTURES:
+        vis = VisualNN(architecture)
+        observation = SnakeEnvironment(seed=SEED).get_observation()
+        name = "-".join(map(str, architecture))
+        results[f"visual_forward/{name}"] = measure(lambda: vis.forward(observation), number=500)
+
+
+def bench_draw_network(results: dict):
+    for architecture in ARCHITECTURES:
+        vis = VisualNN(architecture)
+        # fresh weights every call so every layer is really redrawn
+        states = [VisualNN(architecture).get_model_state() for _ in range(8)]
+        index = iter(range(10**9))
+        name = "-".join(map(str, architecture))
+        results[f"change_state/{name}"] = measure(lambda: vis.change_state(states[next(index) % len(states)]), number=20)
+        # same weights again, the cached edge layers are reused
+        results[f"change_state_unchanged/{name}"] = measure(lambda: vis.change_state(states[0]), number=200)
+
+
+def bench_neuron(results: dict):
+    neuron = Neuron(fill_color=VisualNN.DEFAULT_NEUR_CLR, border_color=VisualNN.DEFAULT_NEUR_B_CLR)
+    activations = np.random.default_rng(SEED).random(4096).tolist()
+    index = iter(range(10**9))
+
+    def recolor():
+        neuron.set_activation_color(activations[next(index) % 4096], VisualNN.DEFAULT_NEUR_CLR, VisualNN.WHITE)
+
+    results["neuron/set_activation_color"] = measure(recolor, number=5000)
+    results["neuron/set_fill_color"] = measure(lambda: neuron.set_fill_color(VisualNN.DEFAULT_NEUR_CLR), number=5000)
+
+    vis = VisualNN(ARCHITECTURES[0])
+    vis.forward(SnakeEnvironment(seed=SEED).get_observation())
+
+    def animation_frame():
+        if vis.is_forward_complete():
+            vis.remaining_animation_steps = len(vis.architecture) + 1
+        vis.render_frame()
+
+    results["visual_render_frame"] = measure(animation_frame, number=500)
+
+
+BENCHMARKS = {
+    "step": bench_step,
+    "reset": bench_reset,
+    "action_mask": bench_action_mask,
+    "render": bench_render,
+    "visual_forward": bench_visual_forward,
+    "draw_network": bench_draw_network,
+    "neuron": bench_neuron,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints current against baseline, returns the names that got slower than tolerance"""
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>12} {result['best_us']:>12.2f} {'new':>8}")
+            continue
+        before = baseline[name]["best_us"]
+        change = result["best_us"] / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<40} {before:>12.2f} {result['best_us']:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before failing (default 0.15)")
+    parser.add_argument("--only", help="comma separated benchmark groups: " + ", ".join(BENCHMARKS))
+    args = parser.parse_args()
+
+    groups = args.only.split(",") if args.only else list(BENCHMARKS)
+    for group in groups:
+        if group not in BENCHMARKS:
+            parser.error(f"unknown benchmark group {group!r}")
+
+    pygame.init()
+    torch.set_num_threads(1)
+    results = {}
+    for group in groups:
+        seed_everything()
+        BENCHMARKS[group](results)
+    for name, result in results.items():
+        print(f"{name:<40} {result['best_us']:>10.2f} us {result['calls_per_second']:>12.0f} /s")
+
+    report = {
+        "meta": {
+            "seed": SEED,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "pygame": pygame.version.ver,
+            "torch_threads": torch.get_num_threads(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Import time budget for the headless modules.
+
+Imports every module the simulation, the worker processes and the training code
+need in a fresh interpreter, the way a new worker does, and checks that none
+of them pulls in pygame or torch and that each stays within its budget. Exits
+non-zero when one does not.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --details snake   # python -X importtime breakdown
+
+Times are the fastest of a few runs, measured around the import statement only
+so interpreter startup is left out. numpy is most of what is left (~50 ms).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEAVY = ("pygame", "torch")
+RUNS = 5
+
+# milliseconds, generous enough for a loaded machine, far under the ~1-2 s torch and
+# pygame cost when one of them sneaks back in
+BUDGET_MS = {
+    "snake": 150,
+    "vec_snake": 150,
+    "env_pool": 200,
+    "recording": 150,
+    "profiler": 50,
+    "metrics": 150,
+    "replay_buffer": 150,
+    "expert_data": 150,
+    "episode_export": 150,
+    "neuroevolution": 200,
+    "nn_visualizer": 150,
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1e3, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def probe(module: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def details(module: str, top: int = 15):
+    """Slowest imports below module, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines()[1:]:
+        # "import time: <self us> | <cumulative us> | <module>"
+        self_us, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), int(self_us.split(":")[-1]), name.rstrip()))
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1e3:>14.1f} {self_us / 1e3:>8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--details", metavar="MODULE", help="print the -X importtime breakdown of a module")
+    args = parser.parse_args()
+    if args.details:
+        details(args.details)
+        return
+
+    failures = []
+    print(f"{'module':<16} {'best ms':>8} {'budget ms':>10}  heavy imports")
+    for module, budget in BUDGET_MS.items():
+        runs = [probe(module) for _ in range(RUNS)]
+        best = min(run["ms"] for run in runs)
+        heavy = runs[0]["heavy"]
+        if heavy or best > budget:
+            failures.append(module)
+        print(f"{module:<16} {best:>8.1f} {budget:>10}  {', '.join(heavy) or '-'}")
+
+    if failures:
+        print(f"\nover budget or importing {' / '.join(HEAVY)}: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import copy
+import os
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+from network import SequentialNetwork
+from replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+from vec_snake import VecSnakeEnvironment
+
+
+def configure_threads(num_threads: int = None) -> int:
+    """Gives torch one intra-op thread per core this process may run on (its CPU affinity,
+    not the machine's core count, so it behaves under taskset and container limits).
+    Returns the thread count."""
+    if num_threads is None:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    torch.set_num_threads(max(1, num_threads))
+    return torch.get_num_threads()
+
+
+class DQNTrainer:
+    """Deep Q-learning on the 12 feature observation, all on the CPU.
+
+    Experience comes from num_envs games stepped together in a VecSnakeEnvironment and goes
+    into a ReplayBuffer (PrioritizedReplayBuffer with prioritized=True) one whole step at a
+    time. Each update trains a SequentialNetwork Q-network on a sampled batch against a
+    target network copied from it every target_update updates, with double DQN targets
+    unless double=False. Acting is epsilon greedy over the moves action_masks allows when
+    mask_actions is set, the exploration rate falling linearly over epsilon_decay_steps.
+
+    Dying is rewarded with death_reward on top of the game's 1 per food. A game going
+    starve_steps steps without eating is started over, without counting it as a death."""
+
+    def __init__(
+        self,
+        architecture: tuple = (12, 64, 64, 4),
+        num_envs: int = 16,
+        buffer_size: int = 100_000,
+        batch_size: int = 256,
+        gamma: float = 0.99,
+        learning_rate: float = 1e-3,
+        epsilon_start: float = 1.0,
+        epsilon_end: float = 0.05,
+        epsilon_decay_steps: int = 50_000,
+        learning_starts: int = 2_000,
+        updates_per_step: int = 2,
+        target_update: int = 500,
+        double: bool = True,
+        prioritized: bool = False,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        death_reward: float = -1.0,
+        starve_steps: int = 200,
+        mask_actions: bool = True,
+        num_threads: int = None,
+        seed: int = None,
+        grid_size: tuple = None,
+    ):
+        self.architecture = architecture
+        self.batch_size = batch_size
+        self.gamma = gamma
+        self.epsilon_start = epsilon_start
+        self.epsilon_end = epsilon_end
+        self.epsilon_decay_steps = epsilon_decay_steps
+        self.learning_starts = learning_starts
+        self.updates_per_step = updates_per_step
+        self.target_update = target_update
+        self.double = double
+        self.beta_start = beta
+        self.death_reward = death_reward
+        self.starve_steps = starve_steps
+        self.mask_actions = mask_actions
+        self.num_threads = configure_threads(num_threads)
+        self.rng = np.random.default_rng(seed)
+        if seed is not None:
+            torch.manual_seed(seed)
+
+        self.env = VecSnakeEnvironment(num_envs, seed=int(self.rng.integers(2**31)), grid_size=grid_size)
+        buffer_seed = int(self.rng.integers(2**31))
+        if prioritized:
+            self.buffer = PrioritizedReplayBuffer(buffer_size, (architecture[0],), buffer_seed, alpha=alpha, beta=beta)
+        else:
+            self.buffer = ReplayBuffer(buffer_size, (architecture[0],), buffer_seed)
+        self.q_network = SequentialNetwork(architecture)
+        self.target_network = copy.deepcopy(self.q_network)
+        self.target_network.requires_grad_(False)
+        self.optimizer = torch.optim.Adam(self.q_network.parameters(), lr=learning_rate)
+
+        self.steps = 0
+        self.updates = 0
+        self.episodes = 0
+        self.best_score = 0
+        self._observations = self.env.reset()
+        self._hungry = np.zeros(num_envs, dtype=np.int32)
+
+    @property
+    def epsilon(self) -> float:
+        progress = min(1.0, self.steps / self.epsilon_decay_steps)
+        return self.epsilon_start + progress * (self.epsilon_end - self.epsilon_start)
+
+    def act(self, observations: np.ndarray, epsilon: float = 0.0) -> np.ndarray:
+        """Epsilon greedy action of every game, never a masked move unless all four are"""
+        q_values = self.q_network.predict(observations).numpy()
+        masks = self.env.action_masks() if self.mask_actions else None
+        if masks is not None:
+            q_values = np.where(masks | ~masks.any(axis=1, keepdims=True), q_values, -np.inf)
+        actions = q_values.argmax(axis=1)
+        explore = self.rng.random(len(actions)) < epsilon
+        if explore.any():
+            # uniform over the allowed moves: the largest of a random number per move
+            noise = self.rng.random((len(actions), 4))
+            if masks is not None:
+                noise = np.where(masks, noise + 1, noise)
+            actions = np.where(explore, noise.argmax(axis=1), actions)
+        return actions
+
+    def collect(self) -> np.ndarray:
+        """Steps every game once and stores the transitions, returns the scores of the games
+        that ended"""
+        observations = self._observations
+        actions = self.act(observations, self.epsilon)
+        # step returns a fresh features array, observations stays valid
+        next_observations, rewards, dones = self.env.step(actions)
+        rewards = rewards + self.death_reward * dones
+        self.buffer.add(observations, actions, rewards, next_observations, dones)
+        self.steps += len(actions)
+        finished = self.env.final_scores[dones]
+
+        self._hungry = np.where((rewards > 0) | dones, 0, self._hungry + 1)
+        starved = np.flatnonzero(self._hungry >= self.starve_steps)
+        if starved.size:
+            finished = np.concatenate([finished, self.env.scores[starved]])
+            self._hungry[starved] = 0
+            next_observations = self.env.reset_games(starved)
+        self._observations = next_observations
+        self.episodes += len(finished)
+        if len(finished):
+            self.best_score = max(self.best_score, int(finished.max()))
+        return finished
+
+    def update(self) -> float:
+        """One gradient step on a sampled batch, returns the loss"""
+        if isinstance(self.buffer, PrioritizedReplayBuffer):
+            # importance sampling correction annealed to full by the end of exploration
+            progress = min(1.0, self.steps / self.epsilon_decay_steps)
+            self.buffer.beta = self.beta_start + progress * (1.0 - self.beta_start)
+        batch = self.buffer.sample(self.batch_size)
+        observations = torch.from_numpy(batch.observations)
+        next_observations = torch.from_numpy(batch.next_observations)
+        actions = torch.from_numpy(batch.actions)
+        rewards = torch.from_numpy(batch.rewards)
+        dones = torch.from_numpy(batch.dones)
+
+        q_values = self.q_network(observations).gather(1, actions[:, None])[:, 0]
+        with torch.no_grad():
+            next_q_values = self.target_network(next_observations)
+            if self.double:
+                next_actions = self.q_network(next_observations).argmax(dim=1, keepdim=True)
+                next_values = next_q_values.gather(1, next_actions)[:, 0]
+            else:
+                next_values = next_q_values.max(dim=1).values
+            targets = rewards + self.gamma * (1 - dones) * next_values
+
+        losses = F.smooth_l1_loss(q_values, targets, reduction="none")
+        loss = (torch.from_numpy(batch.weights) * losses).mean()
+        self.optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(self.q_network.parameters(), 10.0)
+        self.optimizer.step()
+
+        if isinstance(self.buffer, PrioritizedReplayBuffer):
+            self.buffer.update_priorities(batch.indices, (targets - q_values).detach().numpy())
+        self.updates += 1
+        if self.updates % self.target_update == 0:
+            self.target_network.load_state_dict(self.q_network.state_dict())
+        return loss.item()
+
+    def run(self, iterations: int, log_every: int = 1000):
+        """Collects one step of every game and trains updates_per_step batches per iteration,
+        yields stats every log_every iterations"""
+        start = time.perf_counter()
+        scores, losses = [], []
+        for i in range(1, iterations + 1):
+            finished = self.collect()
+            if len(finished):
+                scores.append(finished)
+            if len(self.buffer) >= self.learning_starts:
+                for _ in range(self.updates_per_step):
+                    losses.append(self.update())
+            if i % log_every == 0 or i == iterations:
+                scores = np.concatenate(scores) if scores else np.zeros(0)
+                yield {
+                    "steps": self.steps,
+                    "updates": self.updates,
+                    "episodes": self.episodes,
+                    "mean_score": float(scores.mean()) if len(scores) else 0.0,
+                    "best_score": self.best_score,
+                    "loss": float(np.mean(losses)) if losses else 0.0,
+                    "epsilon": self.epsilon,
+                    "steps_per_second": self.steps / (time.perf_counter() - start),
+                }
+                scores, losses = [], []
+
+    def state_dict(self) -> dict:
+        """Q-network weights, for VisualNN.change_state or a SequentialNetwork"""
+        return self.q_network.state_dict()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a snake Q-network on the CPU")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--envs", type=int, default=16)
+    parser.add_argument("--prioritized", action="store_true")
+    parser.add_argument("--threads", type=int, help="torch threads, one per available core by default")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="save the Q-network state_dict here")
+    args = parser.parse_args()
+
+    trainer = DQNTrainer(num_envs=args.envs, prioritized=args.prioritized, num_threads=args.threads, seed=args.seed)
+    for stats in trainer.run(args.iterations):
+        print(
+            f"step {stats['steps']}: mean score {stats['mean_score']:.2f}, best score {stats['best_score']}, "
+            f"loss {stats['loss']:.4f}, epsilon {stats['epsilon']:.2f}, {stats['steps_per_second']:,.0f} steps/s"
+        )
+    if args.output:
+        torch.save(trainer.state_dict(), args.output)
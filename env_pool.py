@@ -0,0 +1,138 @@
+import ctypes
+import multiprocessing as mp
+import numpy as np
+from vec_snake import VecSnakeEnvironment
+
+
+def _shared_array(raw, shape, dtype) -> np.ndarray:
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return np.frombuffer(raw, dtype=np.uint8)[:nbytes].view(dtype).reshape(shape)
+
+
+def _worker(pipe, raws, specs, lo, hi, seed, observation_mode, grid_size):
+    actions, observations, rewards, dones, masks = [
+        _shared_array(raw, shape, dtype)[lo:hi] for raw, (shape, dtype) in zip(raws, specs)
+    ]
+    env = VecSnakeEnvironment(hi - lo, seed=seed, observation_mode=observation_mode, grid_size=grid_size)
+    while True:
+        command = pipe.recv()
+        try:
+            if command == "step":
+                observations[:], rewards[:], dones[:] = env.step(actions)
+            elif command == "reset":
+                observations[:] = env.reset()
+                rewards[:] = 0
+                dones[:] = False
+            elif command[0] == "masks":
+                masks[:] = env.action_masks(command[1])
+            elif command == "close":
+                break
+            pipe.send(None)
+        except Exception as e:
+            pipe.send(e)
+    pipe.close()
+
+
+class SnakeEnvPool:
+    """Spreads num_envs games over worker processes, each one stepping a VecSnakeEnvironment
+    over its slice of the batch. Actions and results go through preallocated shared memory,
+    only a short command and an acknowledgement cross the pipes."""
+
+    def __init__(self, num_envs: int, num_workers: int = None, seed: int = None, start_method: str = None,
+                 observation_mode: str = "features", grid_size: tuple = None):
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers or mp.cpu_count(), num_envs)
+        context = mp.get_context(start_method)
+
+        observation_shape = VecSnakeEnvironment(1, observation_mode=observation_mode, grid_size=grid_size).reset().shape[1:]
+        specs = [
+            ((num_envs,), np.int8),
+            ((num_envs, *observation_shape), np.float32),
+            ((num_envs,), np.int32),
+            ((num_envs,), np.bool_),
+            ((num_envs, 4), np.bool_),
+        ]
+        raws = [
+            context.RawArray(ctypes.c_uint8, max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+            for shape, dtype in specs
+        ]
+        self.actions, self.observations, self.rewards, self.dones, self.masks = [
+            _shared_array(raw, shape, dtype) for raw, (shape, dtype) in zip(raws, specs)
+        ]
+
+        seeds = np.random.SeedSequence(seed).generate_state(self.num_workers)
+        bounds = np.linspace(0, num_envs, self.num_workers + 1).astype(int)
+        self._pipes = []
+        self._processes = []
+        for i in range(self.num_workers):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child_end, raws, specs, bounds[i], bounds[i + 1], int(seeds[i]), observation_mode, grid_size),
+                daemon=True,
+            )
+            process.start()
+            child_end.close()
+            self._pipes.append(parent_end)
+            self._processes.append(process)
+        self._waiting = False
+        self.closed = False
+
+    def reset(self):
+        self._send("reset")
+        self._wait()
+        return self.observations
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions):
+        if self._waiting:
+            raise Exception("step_async called twice without step_wait")
+        self.actions[:] = actions
+        self._send("step")
+        self._waiting = True
+
+    def step_wait(self):
+        """Returns views into the shared buffers, they are overwritten by the next step"""
+        if not self._waiting:
+            raise Exception("step_wait called without step_async")
+        self._waiting = False
+        self._wait()
+        return (self.observations, self.rewards, self.dones)
+
+    def action_masks(self, lookahead: int = 0) -> np.ndarray:
+        """VecSnakeEnvironment.action_masks of every game, a view overwritten by the next call"""
+        if self._waiting:
+            raise Exception("action_masks called between step_async and step_wait")
+        self._send(("masks", lookahead))
+        self._wait()
+        return self.masks
+
+    def close(self):
+        if self.closed:
+            return
+        if self._waiting:
+            self._wait()
+        self._send("close")
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _send(self, command: str):
+        for pipe in self._pipes:
+            pipe.send(command)
+
+    def _wait(self):
+        errors = [error for error in (pipe.recv() for pipe in self._pipes) if error is not None]
+        if errors:
+            raise errors[0]
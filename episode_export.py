@@ -0,0 +1,326 @@
+import multiprocessing as mp
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from snake import SnakeEnvironment
+from recording import EpisodeReader
+
+# Turns recorded episodes into PNG sequences or GIFs without a window. Episodes are replayed
+# in "pixels" mode, whose frames are render_frame's picture already rasterized into a NumPy
+# array, and encoded here with zlib and a small LZW coder so nothing beyond NumPy is needed.
+# The VisualNN panel, when asked for, is drawn by pygame off screen and copied next to it.
+
+
+def encode_png(frame: np.ndarray, level: int = 6) -> bytes:
+    """8 bit RGB PNG of a (height, width, 3) uint8 frame"""
+    height, width = frame.shape[:2]
+    # every row starts with its filter type, 0 for none
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    rows[:, 1:] = frame.reshape(height, -1)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+class GifWriter:
+    """Animated GIF with one global palette: the exact colors of the game and the network
+    panel, then a 6x6x6 color cube for everything else (the blended neuron fills). After the
+    first frame only the rectangle around what changed is stored, with the pixels that did
+    not change inside it left transparent so they compress to long runs."""
+
+    EXACT_COLORS = (
+        SnakeEnvironment.BLACK, SnakeEnvironment.GRAY, SnakeEnvironment.LIGHTBLUE, SnakeEnvironment.GREEN,
+        SnakeEnvironment.BODY_GREEN, SnakeEnvironment.RED,
+        # VisualNN edge, neuron and border colors
+        (252, 3, 211), (3, 252, 244), (77, 2, 163), (200, 200, 200), (255, 255, 255),
+    )
+    TRANSPARENT = 255
+
+    def __init__(self, path: str, fps: float = 10, loop: bool = True):
+        self._file = open(path, "wb")
+        self._delay = max(2, round(100 / fps))
+        self._loop = loop
+        self._previous = None
+        cube = np.arange(6) * 51
+        palette = [color for color in self.EXACT_COLORS]
+        palette += [(r, g, b) for r in cube for g in cube for b in cube]
+        palette += [(0, 0, 0)] * (256 - len(palette))
+        self._palette = np.array(palette, dtype=np.uint8)
+        exact = np.array([r << 16 | g << 8 | b for r, g, b in self.EXACT_COLORS])
+        self._exact_order = np.argsort(exact)
+        self._exact_keys = exact[self._exact_order]
+
+    def add(self, frame: np.ndarray):
+        height, width = frame.shape[:2]
+        if self._previous is None:
+            self._write_header(width, height)
+            self._previous = frame.copy()
+            self._write_image(self._index(frame), 0, 0, transparent=False)
+            return
+        changed = (frame != self._previous).any(axis=2)
+        rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+        if rows.size == 0:
+            # a frame has to be there to keep the timing, one transparent pixel will do
+            self._write_image(np.full((1, 1), self.TRANSPARENT, dtype=np.uint8), 0, 0, transparent=True)
+            return
+        top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        indices = self._index(frame[top:bottom, left:right])
+        indices[~changed[top:bottom, left:right]] = self.TRANSPARENT
+        self._previous[top:bottom, left:right] = frame[top:bottom, left:right]
+        self._write_image(indices, left, top, transparent=True)
+
+    def close(self):
+        if self._previous is not None:
+            self._file.write(b"\x3B")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write_header(self, width: int, height: int):
+        # global color table of 256 entries, 8 bits per primary
+        self._file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0))
+        self._file.write(self._palette.tobytes())
+        if self._loop:
+            self._file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def _write_image(self, indices: np.ndarray, left: int, top: int, transparent: bool):
+        height, width = indices.shape
+        # graphic control extension: keep the previous frame below, delay in 1/100 s
+        flags = 1 << 2 | transparent
+        self._file.write(struct.pack("<4BHBB", 0x21, 0xF9, 4, flags, self._delay, self.TRANSPARENT, 0))
+        self._file.write(struct.pack("<BHHHHB", 0x2C, left, top, width, height, 0))
+        self._file.write(b"\x08")
+        data = _lzw(indices)
+        for start in range(0, len(data), 255):
+            block = data[start:start + 255]
+            self._file.write(bytes((len(block),)) + block)
+        self._file.write(b"\x00")
+
+    def _index(self, frame: np.ndarray) -> np.ndarray:
+        frame = frame.astype(np.int32)
+        keys = frame[..., 0] << 16 | frame[..., 1] << 8 | frame[..., 2]
+        indices = len(self.EXACT_COLORS) + (
+            (frame[..., 0] + 25) // 51 * 36 + (frame[..., 1] + 25) // 51 * 6 + (frame[..., 2] + 25) // 51
+        )
+        slots = np.minimum(np.searchsorted(self._exact_keys, keys), len(self._exact_keys) - 1)
+        exact = self._exact_keys[slots] == keys
+        indices[exact] = self._exact_order[slots[exact]]
+        return indices.astype(np.uint8)
+
+
+def _lzw(indices: np.ndarray) -> bytes:
+    """GIF flavoured LZW of 8 bit color indices: codes grow from 9 to 12 bits, the table
+    starts over with a clear code once it is full.
+
+    Runs of one color, most of a frame here, are taken a whole table entry at a time:
+    runs[v] lists the codes of v, vv, vvv... so a run needs a step per code written rather
+    than per pixel. The output is the same as the plain one pixel at a time coder's."""
+    pixels = indices.tobytes()
+    count = len(pixels)
+    # run_ends[i] is where the run of equal pixels holding pixel i ends
+    flat = indices.reshape(-1)
+    starts = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], starts, [count]))
+    run_ends = np.repeat(bounds[1:], np.diff(bounds)).tolist()
+
+    clear, end = 256, 257
+    out = bytearray()
+    buffer, bits, code_size = clear, 9, 9
+    table = {}
+    runs = [[value] for value in range(256)]
+    next_code = end + 1
+    i = 0
+    while i < count:
+        value = pixels[i]
+        run = runs[value]
+        length = min(len(run), run_ends[i] - i)
+        prefix = run[length - 1]
+        i += length
+        key = None
+        while i < count:
+            key = prefix << 8 | pixels[i]
+            code = table.get(key)
+            if code is None:
+                break
+            prefix = code
+            i += 1
+        buffer |= prefix << bits
+        bits += code_size
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+        if i == count:
+            break
+        if next_code == 4096:
+            buffer |= clear << bits
+            bits += code_size
+            table.clear()
+            runs = [[value] for value in range(256)]
+            next_code = end + 1
+            code_size = 9
+        else:
+            table[key] = next_code
+            run = runs[pixels[i]]
+            if prefix == run[-1]:
+                run.append(next_code)
+            next_code += 1
+            if next_code > 1 << code_size and code_size < 12:
+                code_size += 1
+    buffer |= end << bits
+    bits += code_size
+    while bits > 0:
+        out.append(buffer & 0xFF)
+        buffer >>= 8
+        bits -= 8
+    return bytes(out)
+
+
+class EpisodeRenderer:
+    """Replays episodes of a recording headless and yields every frame as a (height, width, 3)
+    uint8 array: the board as render_frame draws it, and the VisualNN panel on its right
+    when a visualizer is given (animated one column per frame, like the live view)."""
+
+    def __init__(self, reader: EpisodeReader, cell_size: int = None, visualizer=None):
+        self.reader = reader
+        self.env = SnakeEnvironment("pixels", grid_size=reader.grid_size, cell_size=cell_size)
+        self.visualizer = visualizer
+        width, height = self.env.dim
+        if visualizer is not None:
+            width += visualizer.DIM[0]
+            height = max(height, visualizer.DIM[1])
+        self._frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def frames(self, episode: int):
+        """The starting board, then one frame per step. Frames are the same array, rewritten
+        each time."""
+        seed, _, _ = self.reader.header(episode)
+        yield self._compose(self.env.reset(seed))
+        for action in self.reader.actions(episode).tolist():
+            board, _, _ = self.env.step(action)
+            yield self._compose(board)
+
+    def _compose(self, board: np.ndarray) -> np.ndarray:
+        frame = self._frame
+        frame[:board.shape[0], :board.shape[1]] = board
+        if self.visualizer is not None:
+            import pygame
+            if self.visualizer.is_forward_complete():
+                # the 12 features the network sees, whatever the observation mode
+                self.visualizer.forward(SnakeEnvironment.batch_observations([self.env])[0])
+            panel = pygame.surfarray.pixels3d(self.visualizer.render_frame())
+            left = board.shape[1]
+            frame[:panel.shape[1], left:left + panel.shape[0]] = panel.transpose(1, 0, 2)
+            del panel
+        return frame
+
+
+def export_episode(renderer: EpisodeRenderer, episode: int, output: str, image_format: str = "gif",
+                   fps: float = 10) -> str:
+    """Writes one episode as output.gif or as output/frame_000000.png..., returns the path"""
+    if image_format == "gif":
+        path = output + ".gif"
+        with GifWriter(path, fps) as gif:
+            for frame in renderer.frames(episode):
+                gif.add(frame)
+    elif image_format == "png":
+        path = output
+        os.makedirs(path, exist_ok=True)
+        for i, frame in enumerate(renderer.frames(episode)):
+            with open(os.path.join(path, f"frame_{i:06d}.png"), "wb") as f:
+                f.write(encode_png(frame))
+    else:
+        raise Exception("Invalid image format, must be gif or png")
+    return path
+
+
+_worker_state = {}
+
+
+def _init_worker(recording, output_directory, image_format, fps, cell_size, checkpoint):
+    visualizer = None
+    if checkpoint:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        from neuroevolution import genome_to_state_dict
+        from nn_visualizer import VisualNN
+        from population_store import PopulationStore
+        store = PopulationStore(checkpoint)
+        visualizer = VisualNN(store.architecture, genome_to_state_dict(store.best(), store.architecture))
+    _worker_state.update(
+        renderer=EpisodeRenderer(EpisodeReader(recording), cell_size, visualizer),
+        output_directory=output_directory,
+        image_format=image_format,
+        fps=fps,
+    )
+
+
+def _export_task(episode: int) -> tuple:
+    state = _worker_state
+    renderer = state["renderer"]
+    _, steps, score = renderer.reader.header(episode)
+    output = os.path.join(state["output_directory"], f"episode_{episode:06d}_score_{score}")
+    start = time.perf_counter()
+    path = export_episode(renderer, episode, output, state["image_format"], state["fps"])
+    return episode, path, steps + 1, time.perf_counter() - start
+
+
+def export(recording: str, output_directory: str, episodes: list = None, image_format: str = "gif",
+           fps: float = 10, num_workers: int = None, cell_size: int = None, checkpoint: str = None,
+           start_method: str = None):
+    """Exports episodes of a recording (all of them by default) over a process pool, one
+    episode per task. Yields (episode, path, frames, seconds) as each one is written.
+
+    checkpoint is a PopulationStore whose best genome is drawn in the network panel, the
+    recording's episodes should be ones that network played. Callers that already have a
+    pygame display open should pass start_method="spawn", forked workers inherit it."""
+    # opened here first so a bad path fails once instead of in every worker the pool restarts
+    reader = EpisodeReader(recording)
+    if episodes is None:
+        episodes = range(len(reader))
+    reader.close()
+    if checkpoint:
+        from population_store import PopulationStore
+        PopulationStore(checkpoint)
+    os.makedirs(output_directory, exist_ok=True)
+    initargs = (recording, output_directory, image_format, fps, cell_size, checkpoint)
+    context = mp.get_context(start_method)
+    with context.Pool(num_workers or mp.cpu_count(), initializer=_init_worker, initargs=initargs) as pool:
+        yield from pool.imap_unordered(_export_task, episodes)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Render recorded episodes to GIFs or PNG sequences")
+    parser.add_argument("recording")
+    parser.add_argument("output_directory")
+    parser.add_argument("--episodes", type=int, nargs="*", help="episode numbers, all of them by default")
+    parser.add_argument("--format", choices=("gif", "png"), default="gif")
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--cell-size", type=int, help="pixels per cell, smaller gives smaller files")
+    parser.add_argument("--checkpoint", help="PopulationStore whose best network is drawn beside the board")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = 0
+    for episode, path, frames, seconds in export(
+        args.recording, args.output_directory, args.episodes, args.format, args.fps, args.workers,
+        args.cell_size, args.checkpoint,
+    ):
+        total += frames
+        print(f"episode {episode}: {frames} frames in {seconds:.1f} s -> {path}")
+    elapsed = time.perf_counter() - start
+    print(f"{total:,} frames in {elapsed:.1f} s, {total / elapsed:,.0f} frames/s")
@@ -0,0 +1,135 @@
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from snake import SnakeEnvironment
+from planners import AGENTS
+
+# Expert data is a directory of numbered chunks, chunk_000000.npz, chunk_000001.npz, ...
+# each holding observations (count, 12) float32 and the actions taken on them (count,) uint8.
+# A chunk is written to a temporary name and renamed, so readers only ever see whole ones.
+
+
+class ExpertDataWriter:
+    """Collects (observation, action) pairs in a preallocated chunk and writes it out every
+    time it fills up"""
+
+    def __init__(self, directory: str, chunk_size: int = 100_000, observation_size: int = SnakeEnvironment.OBSERVATION_SIZE):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.chunks = len(_chunk_paths(directory))
+        self.pairs = 0
+        self._observations = np.zeros((chunk_size, observation_size), dtype=np.float32)
+        self._actions = np.zeros(chunk_size, dtype=np.uint8)
+        self._count = 0
+
+    def add(self, observations: np.ndarray, actions: np.ndarray):
+        chunk_size = len(self._actions)
+        start = 0
+        while start < len(actions):
+            take = min(len(actions) - start, chunk_size - self._count)
+            self._observations[self._count:self._count + take] = observations[start:start + take]
+            self._actions[self._count:self._count + take] = actions[start:start + take]
+            self._count += take
+            start += take
+            if self._count == chunk_size:
+                self.flush()
+        self.pairs += len(actions)
+
+    def flush(self):
+        if self._count == 0:
+            return
+        path = os.path.join(self.directory, f"chunk_{self.chunks:06d}.npz")
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, observations=self._observations[:self._count], actions=self._actions[:self._count])
+        os.replace(path + ".tmp", path)
+        self.chunks += 1
+        self._count = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_chunks(directory: str):
+    """Yields (observations, actions) of every chunk in order"""
+    for path in _chunk_paths(directory):
+        with np.load(path) as chunk:
+            yield chunk["observations"], chunk["actions"]
+
+
+def _chunk_paths(directory: str) -> list:
+    names = sorted(name for name in os.listdir(directory) if name.startswith("chunk_") and name.endswith(".npz"))
+    return [os.path.join(directory, name) for name in names]
+
+
+def play_pairs(agent: str, count: int, seed: int, grid_size: tuple = None, starve_steps: int = None) -> tuple:
+    """Lets an agent play episodes back to back until it made count moves, returns
+    (observations, actions, scores of the episodes that ended)"""
+    env = SnakeEnvironment(seed=seed, grid_size=grid_size)
+    player = AGENTS[agent](env)
+    # a planner that found no way to the food can wander forever, those games are cut off
+    starve_steps = starve_steps or 2 * env._cells
+    observations = np.zeros((count, SnakeEnvironment.OBSERVATION_SIZE), dtype=np.float32)
+    actions = np.zeros(count, dtype=np.uint8)
+    scores = []
+
+    observation = env.reset()
+    hungry = 0
+    for i in range(count):
+        action = player.act()
+        observations[i] = observation
+        actions[i] = action
+        observation, reward, lost = env.step(action)
+        hungry = 0 if reward else hungry + 1
+        if lost or hungry >= starve_steps:
+            scores.append(env.score)
+            observation = env.reset()
+            hungry = 0
+    return observations, actions, scores
+
+
+def _play_task(task):
+    return play_pairs(*task)
+
+
+def generate(directory: str, pairs: int, agent: str = "astar", num_workers: int = None, chunk_size: int = 100_000,
+             seed: int = None, grid_size: tuple = None):
+    """Writes pairs expert moves to directory, played by num_workers processes one chunk at
+    a time. Yields (pairs written, scores of the episodes in the last chunk) per chunk."""
+    if agent not in AGENTS:
+        raise Exception("Invalid agent, must be one of " + ", ".join(AGENTS))
+    seeds = np.random.SeedSequence(seed).generate_state(-(-pairs // chunk_size))
+    tasks = [
+        (agent, min(chunk_size, pairs - i * chunk_size), int(task_seed), grid_size)
+        for i, task_seed in enumerate(seeds)
+    ]
+    with mp.Pool(num_workers or mp.cpu_count()) as pool, ExpertDataWriter(directory, chunk_size) as writer:
+        # imap keeps the chunks in task order, so a seed always gives the same files
+        for observations, actions, scores in pool.imap(_play_task, tasks):
+            writer.add(observations, actions)
+            yield writer.pairs, scores
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate (observation, action) pairs from a planner agent")
+    parser.add_argument("directory")
+    parser.add_argument("--pairs", type=int, default=1_000_000)
+    parser.add_argument("--agent", choices=list(AGENTS), default="astar")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--grid", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="board size in cells")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for written, scores in generate(args.directory, args.pairs, args.agent, args.workers, args.chunk_size, args.seed, args.grid):
+        elapsed = time.perf_counter() - start
+        mean_score = np.mean(scores) if scores else float("nan")
+        print(f"{written:,} pairs, mean score {mean_score:.1f}, {written / elapsed * 3600:,.0f} pairs/hour")
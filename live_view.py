@@ -0,0 +1,263 @@
+import argparse
+import threading
+import time
+from snake import SnakeEnvironment
+from metrics import EpisodeMetrics
+
+
+class SnapshotRing:
+    """Bounded ring of snapshots between one producer and one consumer. Publishing never
+    blocks, a full ring overwrites its oldest entry, and the reader only ever takes the
+    newest one so anything it skipped counts as a dropped frame."""
+
+    def __init__(self, size: int = 8):
+        self._slots = [None] * size
+        self._written = 0
+        self._read = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def publish(self, snapshot):
+        with self._lock:
+            self._slots[self._written % len(self._slots)] = snapshot
+            self._written += 1
+
+    def latest(self):
+        """Newest snapshot not seen yet, None when nothing was published since the last call"""
+        with self._lock:
+            if self._written == self._read:
+                return None
+            self.dropped += self._written - self._read - 1
+            self._read = self._written
+            return self._slots[(self._written - 1) % len(self._slots)]
+
+
+class Simulation(threading.Thread):
+    """Plays episodes back to back as fast as allowed, publishing (snapshot, observation,
+    stats) to a SnapshotRing at most publish_interval apart and at the end of every episode.
+
+    steps_per_second None runs flat out, a number throttles the game to that pace. Every
+    episode is recorded to metrics when given one."""
+
+    def __init__(self, env: SnakeEnvironment, policy, ring: SnapshotRing, steps_per_second: float = None,
+                 publish_interval: float = 1 / 120, metrics: EpisodeMetrics = None):
+        super().__init__(daemon=True)
+        self.env = env
+        self.policy = policy
+        self.ring = ring
+        self.steps_per_second = steps_per_second
+        self.publish_interval = publish_interval
+        self.metrics = metrics
+        self.paused = False
+        self.steps = 0
+        self.episodes = 0
+        self.best_score = 0
+        self._stopped = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def run(self):
+        env = self.env
+        metrics = self.metrics
+        observation = env.reset()
+        if metrics is not None:
+            metrics.start()
+        last_publish = 0.0
+        next_step = time.perf_counter()
+        while not self._stopped.is_set():
+            self._resumed.wait()
+            action = self.policy(observation)
+            start = time.perf_counter()
+            observation, _, lost = env.step(action)
+            now = time.perf_counter()
+            self.steps += 1
+            if metrics is not None:
+                metrics.step(now - start)
+            if lost or now - last_publish >= self.publish_interval:
+                self.ring.publish((env.snapshot(), observation.copy(), self.stats()))
+                last_publish = now
+            if lost:
+                self.episodes += 1
+                self.best_score = max(self.best_score, env.score)
+                if metrics is not None:
+                    metrics.end(env)
+                observation = env.reset()
+
+            if self.steps_per_second:
+                next_step = max(next_step + 1 / self.steps_per_second, now - 0.25)
+                delay = next_step - time.perf_counter()
+                if delay > 0:
+                    self._stopped.wait(delay)
+            else:
+                next_step = now
+
+    def stats(self) -> dict:
+        return {"steps": self.steps, "episodes": self.episodes, "score": self.env.score, "best_score": self.best_score}
+
+    def set_paused(self, paused: bool):
+        self.paused = paused
+        if paused:
+            self._resumed.clear()
+        else:
+            self._resumed.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._resumed.set()
+        self.join()
+
+
+class LiveView:
+    """Watches an agent without slowing it down: the game runs in a Simulation thread and
+    the window shows the newest snapshot at a fixed fps, dropping whatever it had no time for.
+
+    Keys: space pauses, up / down double or halve the game speed, f toggles fast-forward
+    (no speed limit), escape quits. With a VisualNN the network panel is drawn on the right
+    and animates the observation of the frame on screen."""
+
+    HEADER = 50
+
+    def __init__(self, env: SnakeEnvironment, policy, fps: int = 30, steps_per_second: float = 10,
+                 visualizer=None, ring_size: int = 8, metrics: EpisodeMetrics = None):
+        self.env = env
+        self.fps = fps
+        self.visualizer = visualizer
+        # None starts fast-forwarded, the speed then only matters once f turns it off
+        self.fast_forward = steps_per_second is None
+        self.speed = steps_per_second or 10
+        self.ring = SnapshotRing(ring_size)
+        self.simulation = Simulation(env, policy, self.ring, steps_per_second, metrics=metrics)
+
+    def run(self):
+        import pygame
+        pygame.init()
+        width, height = self.env.dim
+        if self.visualizer is not None:
+            width += self.visualizer.DIM[0]
+            height = max(height, self.visualizer.DIM[1])
+        window = pygame.display.set_mode((width, height + self.HEADER))
+        pygame.display.set_caption("Snake live view")
+        font = pygame.font.SysFont("ocraii", 20)
+        board = pygame.Surface(self.env.dim)
+        background = self._background(self.env)
+        clock = pygame.time.Clock()
+
+        self.simulation.start()
+        snapshot, stats = None, self.simulation.stats()
+        last_stats, last_time = stats, time.perf_counter()
+        steps_per_second = 0.0
+        running = True
+        try:
+            while running:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN:
+                        running = self._handle_key(event.key, pygame)
+
+                published = self.ring.latest()
+                if published is not None:
+                    snapshot, observation, stats = published
+                    self.draw_snapshot(board, background, snapshot, self.env)
+                    if self.visualizer is not None and self.visualizer.is_forward_complete():
+                        self.visualizer.forward(observation)
+
+                now = time.perf_counter()
+                if now - last_time >= 0.5:
+                    steps_per_second = (stats["steps"] - last_stats["steps"]) / (now - last_time)
+                    last_stats, last_time = stats, now
+
+                window.fill((0, 0, 0))
+                window.blit(board, (0, self.HEADER))
+                if self.visualizer is not None:
+                    window.blit(self.visualizer.render_frame(), (self.env.dim[0], self.HEADER))
+                speed = "paused" if self.simulation.paused else "fast-forward" if self.fast_forward else f"{self.speed:g} steps/s"
+                text = (
+                    f"Score {stats['score']}  best {stats['best_score']}  episode {stats['episodes']}  "
+                    f"{steps_per_second:,.0f} steps/s  [{speed}]  dropped {self.ring.dropped}"
+                )
+                window.blit(font.render(text, True, (255, 255, 255)), (10, 15))
+                pygame.display.flip()
+                clock.tick(self.fps)
+        finally:
+            self.simulation.stop()
+
+    def _handle_key(self, key, pygame) -> bool:
+        if key == pygame.K_ESCAPE:
+            return False
+        if key == pygame.K_SPACE:
+            self.simulation.set_paused(not self.simulation.paused)
+        elif key == pygame.K_f:
+            self.fast_forward = not self.fast_forward
+        elif key == pygame.K_UP:
+            self.speed *= 2
+        elif key == pygame.K_DOWN:
+            self.speed = max(self.speed / 2, 0.5)
+        self.simulation.steps_per_second = None if self.fast_forward else self.speed
+        return True
+
+    @staticmethod
+    def _background(env: SnakeEnvironment):
+        import pygame
+        width, height = env.dim
+        background = pygame.Surface(env.dim)
+        background.fill(SnakeEnvironment.BLACK)
+        if env._grid_line:
+            for x in range(0, width, env.cell_size):
+                pygame.draw.line(background, SnakeEnvironment.GRAY, (x, 0), (x, height - 1), 1)
+            for y in range(0, height, env.cell_size):
+                pygame.draw.line(background, SnakeEnvironment.GRAY, (0, y), (width - 1, y), 1)
+        return background
+
+    @staticmethod
+    def draw_snapshot(surface, background, snapshot, env: SnakeEnvironment):
+        """Paints a Snapshot the way render_frame shows the game: body over head over food"""
+        surface.blit(background, (0, 0))
+        size, line = env.cell_size, env._grid_line
+        width = snapshot.width
+
+        def paint(cell, color):
+            surface.fill(color, ((cell % width) * size + line, (cell // width) * size + line, size - line, size - line))
+
+        body = set(snapshot.body)
+        cells = body | {snapshot.head}
+        if snapshot.food >= 0:
+            cells.add(snapshot.food)
+        for cell in cells:
+            paint(cell, SnakeEnvironment.cell_color(snapshot, cell, cell in body))
+
+
+def network_policy(network):
+    """Greedy policy of a NumpyNetwork"""
+    return lambda observation: int(network.forward(observation).argmax())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch an agent play at full speed")
+    parser.add_argument("--checkpoint", help="PopulationStore to take the best genome from, random safe moves otherwise")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--speed", type=float, default=10, help="game steps per second until fast-forwarded")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--grid", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="board size in cells")
+    parser.add_argument("--metrics", help="append per-episode stats to this .jsonl or .csv file")
+    args = parser.parse_args()
+
+    env = SnakeEnvironment(seed=args.seed, grid_size=args.grid)
+    visualizer = None
+    if args.checkpoint:
+        from neuroevolution import genome_to_state_dict
+        from nn_visualizer import VisualNN
+        from numpy_network import NumpyNetwork
+        from population_store import PopulationStore
+        store = PopulationStore(args.checkpoint)
+        genome = store.best()
+        network = NumpyNetwork(store.architecture, genome)
+        visualizer = VisualNN(store.architecture, genome_to_state_dict(genome, store.architecture))
+        policy = network_policy(network)
+    else:
+        policy = lambda observation: env.sample_safe_action()
+    metrics = EpisodeMetrics(args.metrics) if args.metrics else None
+    LiveView(env, policy, fps=args.fps, steps_per_second=args.speed, visualizer=visualizer, metrics=metrics).run()
+    if metrics is not None:
+        metrics.close()
+        print(metrics.summary())
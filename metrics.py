@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# what a record of EpisodeMetrics holds, in CSV column order
+FIELDS = ("episode", "score", "length", "steps", "cause", "seconds", "step_ms", "ended_at")
+# the numeric fields percentiles() covers
+ROLLING_FIELDS = ("score", "length", "steps", "seconds", "step_ms")
+
+
+def death_cause(env) -> str:
+    """How a SnakeEnvironment game was lost: "wall", "tail" or "body", None while it is not"""
+    if not env.lost:
+        return None
+    if env._hit_tail:
+        return "tail"
+    if env._hit_cell is not None:
+        return "body"
+    return "wall"
+
+
+class EpisodeMetrics:
+    """Per-episode stats kept in memory and streamed to a file without blocking the game loop.
+
+    The loop calls start() when an episode begins, step(seconds) after every move with the
+    time the move itself took, and end() when it is over. end() turns the episode into a
+    record of FIELDS:
+        score, length   food eaten and cells the snake covers
+        steps, cause    moves made and how the game ended, see end()
+        seconds         wall time of the whole episode, drawing and frame delays included
+        step_ms         mean time per move of what the loop timed, env.step on its own in
+                        play.py and live_view, 0 when step() is not given the time
+    The newest window records of every numeric field stay in NumPy rings for
+    percentiles() and summary().
+
+    With a path, records are handed to a background thread that appends them to it in
+    batches, every flush_interval seconds or as soon as flush_every are waiting. A .csv path
+    gets a header and one row per episode, anything else one JSON object per line. When
+    the file cannot keep up at most max_pending records wait; the oldest beyond that are
+    dropped and counted in dropped rather than holding the game up."""
+
+    def __init__(self, path: str = None, window: int = 1000, flush_every: int = 256, flush_interval: float = 1.0,
+                 max_pending: int = 100_000):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.episodes = 0
+        self.written = 0
+        self.dropped = 0
+        self._window = {name: np.zeros(window, dtype=np.float64) for name in ROLLING_FIELDS}
+        self._causes = {}
+        self._steps = 0
+        self._step_seconds = 0.0
+        self._start = time.perf_counter()
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        if path is not None:
+            self._thread = threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        self._steps = 0
+        self._step_seconds = 0.0
+        self._start = time.perf_counter()
+
+    def step(self, seconds: float = 0.0):
+        self._steps += 1
+        self._step_seconds += seconds
+
+    def end(self, env, cause: str = None) -> dict:
+        """Records the episode env just played, cause defaulting to death_cause(env) (callers
+        cutting a game short pass their own, "starved" or "quit"). Starts the next episode
+        and returns the record."""
+        seconds = time.perf_counter() - self._start
+        steps = self._steps
+        record = {
+            "episode": self.episodes,
+            "score": env.score,
+            "length": env.score + 1,
+            "steps": steps,
+            "cause": cause or death_cause(env) or "alive",
+            "seconds": seconds,
+            "step_ms": self._step_seconds / steps * 1e3 if steps else 0.0,
+            "ended_at": time.time(),
+        }
+        slot = self.episodes % len(self._window["score"])
+        for name in ROLLING_FIELDS:
+            self._window[name][slot] = record[name]
+        self._causes[record["cause"]] = self._causes.get(record["cause"], 0) + 1
+        self.episodes += 1
+
+        if self._thread is not None:
+            with self._lock:
+                self._pending.append(record)
+                if len(self._pending) > self.max_pending:
+                    excess = len(self._pending) - self.max_pending
+                    del self._pending[:excess]
+                    self.dropped += excess
+                waiting = len(self._pending)
+            if waiting >= self.flush_every:
+                self._wake.set()
+        self.start()
+        return record
+
+    def percentiles(self, field: str = "score", q=(50, 90, 99)) -> dict:
+        """Percentiles of a numeric field over the last window episodes, by q"""
+        if field not in self._window:
+            raise Exception("Invalid field, must be one of " + ", ".join(ROLLING_FIELDS))
+        count = min(self.episodes, len(self._window[field]))
+        if count == 0:
+            return {p: 0.0 for p in q}
+        values = np.percentile(self._window[field][:count], q)
+        return {p: float(value) for p, value in zip(q, values)}
+
+    def summary(self) -> dict:
+        count = min(self.episodes, len(self._window["score"]))
+        return {
+            "episodes": self.episodes,
+            "mean_score": float(self._window["score"][:count].mean()) if count else 0.0,
+            "score": self.percentiles("score"),
+            "step_ms": self.percentiles("step_ms"),
+            "causes": dict(self._causes),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        """Writes out whatever is still waiting and stops the writer thread"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write_loop(self):
+        is_csv = os.path.splitext(self.path)[1].lower() == ".csv"
+        with open(self.path, "a", newline="" if is_csv else None) as f:
+            writer = None
+            if is_csv:
+                writer = csv.DictWriter(f, FIELDS)
+                if f.tell() == 0:
+                    writer.writeheader()
+            while True:
+                stopping = self._stopped.is_set()
+                if not stopping:
+                    self._wake.wait(self.flush_interval)
+                    self._wake.clear()
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                if batch:
+                    if writer is not None:
+                        writer.writerows(batch)
+                    else:
+                        f.write("".join(json.dumps(record) + "\n" for record in batch))
+                    f.flush()
+                    self.written += len(batch)
+                # one more pass after close() was called picks up the last records
+                if stopping:
+                    return
@@ -0,0 +1,34 @@
+import torch
+import torch.nn as nn
+
+class SequentialNetwork(nn.Module):
+    def __init__(self, architecture):
+        super(SequentialNetwork, self).__init__()
+        self.layers = nn.ModuleList([
+            nn.Linear(in_features, out_features) 
+            for in_features, out_features in zip(architecture[:-1], architecture[1:])
+        ])
+        self.activation = nn.ReLU()  
+        # when set, forward keeps every layer's output (input included) in self.activations
+        self.record_activations = False
+        self.activations = []
+
+    def forward(self, x):
+        """Takes a single observation or a (batch, inputs) tensor, returns the output logits"""
+        if self.record_activations:
+            self.activations = [x.detach()]
+
+        for i, layer in enumerate(self.layers):
+            x = layer(x)  
+            if i < len(self.layers) - 1:  
+                x = self.activation(x)
+            if self.record_activations:
+                self.activations.append(x.detach())
+        
+        return x
+
+    def predict(self, observations) -> torch.Tensor:
+        """Batched inference for arrays or tensors of observations, no autograd and no copies
+        for float32 input"""
+        with torch.inference_mode():
+            return self.forward(torch.as_tensor(observations, dtype=torch.float))
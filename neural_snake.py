@@ -1,9 +1,26 @@
-import pygame
 from snake import SnakeEnvironment
 from nn_visualizer import VisualNN
+from neuroevolution import GeneticTrainer
 
 
 class NeuralSnake():
-    def __init__(self):
+    def __init__(self, architecture: tuple = (12, 8, 8, 4)):
         self.snake_env = SnakeEnvironment()
-        self.nn_vis = VisualNN([12,8,8,4])
\ No newline at end of file
+        self.nn_vis = VisualNN(architecture)
+        self.trainer = None
+
+    def train(self, generations: int, **trainer_args):
+        """Evolves a population headless in worker processes, only the best genome so far is
+        loaded into the visualizer"""
+        self.trainer = GeneticTrainer(self.nn_vis.architecture, **trainer_args)
+        try:
+            for stats in self.trainer.run(generations):
+                if stats["new_best"]:
+                    self.nn_vis.change_state(self.trainer.best_state_dict())
+                print(
+                    f"generation {stats['generation']}: best score {stats['best_score']:.2f}, "
+                    f"best fitness {stats['best_fitness']:.2f}, mean fitness {stats['mean_fitness']:.2f}, "
+                    f"{stats['generations_per_second']:.2f} generations/s"
+                )
+        finally:
+            self.trainer.close()
@@ -0,0 +1,212 @@
+import ctypes
+import multiprocessing as mp
+import time
+import numpy as np
+from vec_snake import VecSnakeEnvironment
+from numpy_network import NumpyPopulation, genome_size, unflatten
+from population_store import PopulationStore
+
+# networks are run with NumPy, torch is only imported to hand a genome to a SequentialNetwork
+
+
+def genome_to_state_dict(genome: np.ndarray, architecture: list) -> dict:
+    import torch
+    params = unflatten(genome.reshape(1, -1), architecture)
+    state_dict = {}
+    for i in range(len(architecture) - 1):
+        state_dict[f"layers.{i}.weight"] = torch.tensor(params[2 * i][0])
+        state_dict[f"layers.{i}.bias"] = torch.tensor(params[2 * i + 1][0])
+    return state_dict
+
+
+def random_genomes(count: int, architecture: list, rng: np.random.Generator) -> np.ndarray:
+    """Same distribution as nn.Linear's default init, U(-1/sqrt(in), 1/sqrt(in))"""
+    layers = []
+    for in_features, out_features in zip(architecture[:-1], architecture[1:]):
+        bound = 1 / np.sqrt(in_features)
+        layers.append(rng.uniform(-bound, bound, (count, (in_features + 1) * out_features)))
+    return np.concatenate(layers, axis=1).astype(np.float32)
+
+
+def play_genomes(genomes: np.ndarray, architecture: list, seed: int, max_steps: int, starve_steps: int):
+    """Plays one headless game per genome, all of them stepped together. Each network is run
+    on its own game through batched matmuls over the stacked weights. Returns (scores, steps)."""
+    count = len(genomes)
+    networks = NumpyPopulation(genomes, architecture)
+    env = VecSnakeEnvironment(count, seed=seed)
+    observations = env.reset()
+
+    scores = np.zeros(count, dtype=np.int32)
+    steps = np.zeros(count, dtype=np.int32)
+    hungry = np.zeros(count, dtype=np.int32)
+    playing = np.ones(count, dtype=bool)
+    for _ in range(max_steps):
+        observations, rewards, dones = env.step(networks.act(observations))
+        steps += playing
+        hungry = np.where(rewards > 0, 0, hungry + 1)
+        ended = playing & (dones | (hungry >= starve_steps))
+        scores[ended] = np.where(dones, env.final_scores, env.scores)[ended]
+        playing &= ~ended
+        if not playing.any():
+            break
+    scores[playing] = env.scores[playing]
+    return scores, steps
+
+
+_worker_state = {}
+
+
+def _shared_array(raw, shape, dtype) -> np.ndarray:
+    return np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+def _init_worker(raw_population, raw_fitness, raw_scores, shape, architecture, episodes, max_steps, starve_steps):
+    _worker_state.update(
+        population=_shared_array(raw_population, shape, np.float32),
+        fitness=_shared_array(raw_fitness, shape[:1], np.float64),
+        scores=_shared_array(raw_scores, shape[:1], np.float64),
+        architecture=architecture,
+        episodes=episodes,
+        max_steps=max_steps,
+        starve_steps=starve_steps,
+    )
+
+
+def _evaluate_chunk(task):
+    lo, hi, seed = task
+    state = _worker_state
+    # a single game is mostly luck, average a few per genome
+    episodes = state["episodes"]
+    genomes = np.repeat(state["population"][lo:hi], episodes, axis=0)
+    scores, steps = play_genomes(genomes, state["architecture"], seed, state["max_steps"], state["starve_steps"])
+    scores = scores.reshape(-1, episodes).mean(axis=1)
+    steps = steps.reshape(-1, episodes).mean(axis=1)
+    state["scores"][lo:hi] = scores
+    # food first, surviving longer only breaks ties
+    state["fitness"][lo:hi] = scores + steps / (state["max_steps"] + 1)
+
+
+class GeneticTrainer:
+    """Genetic algorithm over flat SequentialNetwork weight vectors.
+
+    The population lives in shared memory, worker processes score slices of it in place
+    so only (lo, hi, seed) tuples are sent to them. Each generation keeps the elite, then
+    fills the rest with tournament selected parents, uniform crossover and gaussian mutation.
+
+    With a checkpoint path every evaluated generation is appended to a PopulationStore there,
+    and a run started on an existing checkpoint carries on by breeding the next generation
+    from its last one and that generation's stored fitness."""
+
+    def __init__(
+        self,
+        architecture: list,
+        population_size: int = 1000,
+        num_workers: int = None,
+        elite: int = 10,
+        tournament_size: int = 5,
+        mutation_rate: float = 0.05,
+        mutation_scale: float = 0.2,
+        episodes: int = 4,
+        max_steps: int = 1000,
+        starve_steps: int = 200,
+        seed: int = None,
+        checkpoint: str = None,
+    ):
+        self.architecture = architecture
+        self.population_size = population_size
+        self.elite = elite
+        self.tournament_size = tournament_size
+        self.mutation_rate = mutation_rate
+        self.mutation_scale = mutation_scale
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+        self.best_genome = None
+        self.best_fitness = -np.inf
+
+        shape = (population_size, genome_size(architecture))
+        raw_population = mp.RawArray(ctypes.c_float, shape[0] * shape[1])
+        raw_fitness = mp.RawArray(ctypes.c_double, population_size)
+        raw_scores = mp.RawArray(ctypes.c_double, population_size)
+        self.population = _shared_array(raw_population, shape, np.float32)
+        self.fitness = _shared_array(raw_fitness, shape[:1], np.float64)
+        self.scores = _shared_array(raw_scores, shape[:1], np.float64)
+        self.population[:] = random_genomes(population_size, architecture, self.rng)
+
+        self.store = None
+        if checkpoint:
+            self.store = PopulationStore(checkpoint, architecture)
+            if self.store.generations:
+                # the stored generation was evaluated already, so carry on with its children.
+                # Rows it had no genome for stay out of selection.
+                last, fitness = self.store.generation(self.store.generations[-1])
+                count = min(len(last), population_size)
+                self.population[:count] = last[:count]
+                self.fitness[:] = -np.inf
+                self.fitness[:count] = np.nan_to_num(fitness[:count], nan=-np.inf)
+                self._breed()
+                self.generation = self.store.generations[-1] + 1
+                self.best_genome = self.store.best().copy()
+                self.best_fitness = float(np.nanmax(self.store.fitness()))
+
+        self.num_workers = num_workers or mp.cpu_count()
+        self._pool = mp.Pool(
+            self.num_workers,
+            initializer=_init_worker,
+            initargs=(raw_population, raw_fitness, raw_scores, shape, architecture, episodes, max_steps, starve_steps),
+        )
+        # a few chunks per worker keeps everyone busy when some games run long
+        chunks = min(population_size, self.num_workers * 4)
+        self._bounds = np.linspace(0, population_size, chunks + 1).astype(int)
+
+    def evaluate(self):
+        seed = int(self.rng.integers(2**31))
+        tasks = [(int(lo), int(hi), seed + i) for i, (lo, hi) in enumerate(zip(self._bounds[:-1], self._bounds[1:]))]
+        self._pool.map(_evaluate_chunk, tasks)
+
+    def run(self, generations: int):
+        """Evaluates and breeds for the given number of generations, yields stats after each one"""
+        start = time.perf_counter()
+        for i in range(generations):
+            self.evaluate()
+            if self.store is not None:
+                self.store.append(self.population, self.generation, self.fitness)
+            best = int(np.argmax(self.fitness))
+            new_best = self.fitness[best] > self.best_fitness
+            if new_best:
+                self.best_fitness = float(self.fitness[best])
+                self.best_genome = self.population[best].copy()
+            stats = {
+                "generation": self.generation,
+                "best_fitness": float(self.fitness[best]),
+                "mean_fitness": float(self.fitness.mean()),
+                "best_score": float(self.scores.max()),
+                "new_best": bool(new_best),
+                "generations_per_second": (i + 1) / (time.perf_counter() - start),
+            }
+            self._breed()
+            self.generation += 1
+            yield stats
+
+    def best_state_dict(self) -> dict:
+        return genome_to_state_dict(self.best_genome, self.architecture)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def _breed(self):
+        size, length = self.population.shape
+        children = size - self.elite
+        order = np.argsort(-self.fitness)
+        elite = self.population[order[:self.elite]]
+
+        candidates = self.rng.integers(0, size, (2, children, self.tournament_size))
+        winners = np.take_along_axis(candidates, self.fitness[candidates].argmax(axis=2)[..., None], axis=2)[..., 0]
+        mothers, fathers = self.population[winners[0]], self.population[winners[1]]
+
+        offspring = np.where(self.rng.random((children, length)) < 0.5, mothers, fathers)
+        mutate = self.rng.random((children, length)) < self.mutation_rate
+        offspring += mutate * self.rng.normal(0, self.mutation_scale, (children, length)).astype(np.float32)
+
+        self.population[:self.elite] = elite
+        self.population[self.elite:] = offspring
@@ -0,0 +1,91 @@
+import pygame
+
+class Neuron(pygame.sprite.Sprite):
+    # activation colors are snapped to this many steps between the low and high color
+    ACTIVATION_LEVELS = 64
+    MAX_CACHED_IMAGES = 4096
+    # pre-rendered images shared by every neuron, keyed by everything that changes the look,
+    # so recoloring is a dict lookup and an image swap instead of a new Surface
+    _image_cache = {}
+
+    def __init__(
+        self,
+        x=0,
+        y=0,
+        radius=14,
+        fill_color=(0,0,0),   
+        border_color=(0,0,0), 
+        border_thickness=2
+    ):
+        super().__init__()
+        self.x, self.y = x, y
+        self.radius = radius
+        
+        # Colors
+        self.fill_color = tuple(fill_color)
+        self.border_color = tuple(border_color)
+        self.border_thickness = border_thickness
+        
+        self.update_image()
+
+    def update_image(self):
+        key = (self.radius, self.fill_color, self.border_color, self.border_thickness)
+        image = Neuron._image_cache.get(key)
+        if image is None:
+            if len(Neuron._image_cache) >= self.MAX_CACHED_IMAGES:
+                Neuron._image_cache.clear()
+            image = self._render_image()
+            Neuron._image_cache[key] = image
+        self.image = image
+        self.rect = self.image.get_rect(center=(self.x, self.y))
+
+    def _render_image(self):
+        size = self.radius * 2
+        image = pygame.Surface((size, size), pygame.SRCALPHA)
+        
+        if self.border_thickness > 0:
+            pygame.draw.circle(
+                image,
+                self.border_color,
+                (self.radius, self.radius),
+                self.radius
+            )
+            pygame.draw.circle(
+                image,
+                self.fill_color,
+                (self.radius, self.radius),
+                self.radius - self.border_thickness
+            )
+        else:
+            pygame.draw.circle(
+                image,
+                self.fill_color,
+                (self.radius, self.radius),
+                self.radius
+            )
+        return image
+
+    def set_position(self, x, y):
+        self.x, self.y = x, y
+        self.rect.center = (x, y)
+
+    def set_fill_color(self, color):
+        self.fill_color = tuple(color)
+        self.update_image()
+
+    def set_border_color(self, color):
+        self.border_color = tuple(color)
+        self.update_image()
+
+    def set_activation_color(self, activation, color_low, color_high, min_val=0.0, max_val=1.0):
+        activation = max(min(activation, max_val), min_val)
+        fraction = (activation - min_val) / (max_val - min_val) if max_val != min_val else 0
+        fraction = round(fraction * (self.ACTIVATION_LEVELS - 1)) / (self.ACTIVATION_LEVELS - 1)
+
+        #linearly interpolate yo!!!!!!!
+        r = int(color_low[0] + (color_high[0] - color_low[0]) * fraction)
+        g = int(color_low[1] + (color_high[1] - color_low[1]) * fraction)
+        b = int(color_low[2] + (color_high[2] - color_low[2]) * fraction)
+
+        self.fill_color = (r, g, b)
+        self.update_image()
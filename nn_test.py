@@ -1,4 +1,5 @@
 from nn_visualizer import VisualNN
+from profiler import profiler, instrument_visual_nn
 import pygame
 import random
 
@@ -14,22 +15,32 @@ def main():
 
     while True:
 
-        pygame.time.delay(200)
+        with profiler.phase("delay"):
+            pygame.time.delay(200)
 
-        for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        return
 
         if(visualizer.is_forward_complete()):
             print(output) #use this to take game step
             input = [random.randint(-10,10) for i in range(x[0])]
             output = max(visualizer.forward(input))
+            profiler.count("forwards")
             
 
         window.fill((0, 0, 0))
         window.blit(visualizer.render_frame(), (0, 0))
 
-        pygame.display.update()
+        with profiler.phase("display_update"):
+            pygame.display.update()
+        profiler.count("frames")
+        profiler.tick()
 
-main()
+if __name__ == "__main__":
+    # SNAKE_PROFILE=1 / SNAKE_PROFILE_TRACE=trace.json, see profiler.Profiler
+    profiler.enable_from_env()
+    instrument_visual_nn()
+    main()
 
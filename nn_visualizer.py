@@ -1,8 +1,17 @@
-import pygame
 import numpy as np
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
+from numpy_network import NumpyNetwork
+
+# pygame and torch are only imported once a VisualNN is built, the Neuron sprite and the
+# network live in nn_sprites.py and network.py and are still importable from here
+def __getattr__(name):
+    if name == "Neuron":
+        from nn_sprites import Neuron
+        return Neuron
+    if name == "SequentialNetwork":
+        from network import SequentialNetwork
+        return SequentialNetwork
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class VisualNN:
     POS_WEIGHT_CLR = (252, 3, 211)
@@ -13,9 +22,14 @@ class VisualNN:
     DIM = (501, 751)
 
     def __init__(self, architecture: list, state_dict: dict = None):
+        import pygame
+        from network import SequentialNetwork
+        from nn_sprites import Neuron
 
         self.architecture = architecture
         self.model = SequentialNetwork(self.architecture)
+        # forward passes run on a NumPy copy of the weights, kept in step by change_state
+        self.network = NumpyNetwork.from_model(self.model)
 
         self.canvas = pygame.Surface(self.DIM)
         self.all_sprites = pygame.sprite.Group()
@@ -24,6 +38,23 @@ class VisualNN:
         self.neuron_sprites = [[Neuron() for _ in range(i)] for i in self.architecture]
         self.all_sprites.add(*[neuron for layer in self.neuron_sprites for neuron in layer])
 
+        # edges are pre-rendered, one colorkeyed surface per layer of weights just big enough
+        # to hold its lines
+        self.neuron_positions = self._layout(self.architecture)
+        self.edge_layers = []
+        self.edge_rects = []
+        for i in range(len(self.architecture) - 1):
+            points = self.neuron_positions[i] + self.neuron_positions[i + 1]
+            left, top = min(x for x, _ in points), min(y for _, y in points)
+            right, bottom = max(x for x, _ in points), max(y for _, y in points)
+            # room for the widest line on every side
+            rect = pygame.Rect(int(left) - 4, int(top) - 4, int(right - left) + 9, int(bottom - top) + 9)
+            layer = pygame.Surface(rect.size)
+            layer.set_colorkey((0, 0, 0))
+            self.edge_layers.append(layer)
+            self.edge_rects.append(rect)
+        self.edge_styles = [None] * len(self.edge_layers)
+
         if state_dict:
             self.change_state(state_dict) # will call _draw_network
         else:
@@ -33,14 +64,16 @@ class VisualNN:
 
     def change_state(self, state_dict: dict):               
         self.model.load_state_dict(state_dict)
+        self.network.load_state_dict(self.model.state_dict())
         self._draw_network()
 
     def get_model_state(self):    
         return self.model.state_dict()
 
     def forward(self, x):  
-        x = torch.tensor(x, dtype=torch.float)    
-        self.activations = self.model.forward(x)
+        x = np.asarray(x, dtype=np.float32)
+        self.network.forward(x)
+        self.activations = [x.tolist()] + [out.tolist() for out in self.network.outputs]
         self.remaining_animation_steps = len(self.architecture) + 1
         return self.activations[-1] 
 
@@ -85,139 +118,66 @@ class VisualNN:
 
     def _draw_network(self):
 
-        weight_matrices = [param for name, param in self.model.state_dict().items() if "weight" in name]
+        weight_matrices = [param.numpy() for name, param in self.model.state_dict().items() if "weight" in name]
+
+        redrawn = []
+        for i, weights in enumerate(weight_matrices):
+            # line styles for the whole layer in one pass, float64 like the .item() maths it replaced
+            weights = weights.astype(np.float64)
+            max_abs_weight = np.abs(weights).max() if weights.size > 0 else 1.0
+            fraction = np.abs(weights) / max_abs_weight if max_abs_weight != 0 else np.zeros_like(weights)
+            min_thickness, max_thickness = 1, 4
+            thickness = (min_thickness + (max_thickness - min_thickness) * fraction).astype(int)
+            style = np.where(weights > 0, thickness, -thickness)
+
+            # a layer is only redrawn when one of its lines changes thickness or sign
+            if self.edge_styles[i] is not None and np.array_equal(style, self.edge_styles[i]):
+                continue
+            self.edge_styles[i] = style
+            self._draw_edge_layer(i, style)
+            redrawn.append(self.edge_rects[i])
+
+        if redrawn:
+            # recompose only the area of the layers that changed, neighbours may overlap it
+            area = redrawn[0].unionall(redrawn[1:])
+            self.canvas.set_clip(area)
+            self.canvas.fill((0, 0, 0))
+            for layer, rect in zip(self.edge_layers, self.edge_rects):
+                self.canvas.blit(layer, rect)
+            self.canvas.set_clip(None)
 
-        self.canvas.fill((0, 0, 0))
+        for i in range(len(self.architecture)):
+            for j in range(self.architecture[i]):
+                # place a neuron:
+                self.neuron_sprites[i][j].set_position(*self.neuron_positions[i][j])
+                self.neuron_sprites[i][j].set_fill_color(self.DEFAULT_NEUR_CLR)
+                self.neuron_sprites[i][j].set_border_color(self.DEFAULT_NEUR_B_CLR)
 
+    def _draw_edge_layer(self, i: int, style: np.ndarray):
+        import pygame
+        layer = self.edge_layers[i]
+        layer.fill((0, 0, 0))
+        left, top = self.edge_rects[i].topleft
+        targets = [(x - left, y - top) for x, y in self.neuron_positions[i + 1]]
+        # style is (out, in), lines are drawn source neuron first like the original loop
+        for (x, y), line_styles in zip(self.neuron_positions[i], style.T.tolist()):
+            start = (x - left, y - top)
+            for end, line_style in zip(targets, line_styles):
+                color = self.POS_WEIGHT_CLR if line_style > 0 else self.NEG_WEIGHT_CLR
+                pygame.draw.line(layer, color, start, end, abs(line_style))
+
+    @staticmethod
+    def _layout(architecture: list) -> list:
         WIDTH = 120
         HEIGHT = 60
         START_X = 50
         START_Y = 50
 
-        mid_height = max(self.architecture) * HEIGHT / 2
+        mid_height = max(architecture) * HEIGHT / 2
 
-        for i in range(len(self.architecture)):
+        positions = []
+        for i in range(len(architecture)):
             x = WIDTH * i + START_X
-            y = mid_height - (self.architecture[i] * HEIGHT / 2) + START_Y
-
-            for j in range(self.architecture[i]):
-                
-                # sub routine to draw lines 
-                if i < len(self.architecture)-1:
-                    for k in range(self.architecture[i+1]):
-
-                        max_abs_weight = weight_matrices[i].abs().max().item() if weight_matrices[i].numel() > 0 else 1.0
-                        weight = weight_matrices[i][k][j].item()
-                        fraction = abs(weight) / max_abs_weight if max_abs_weight != 0 else 0
-                        min_thickness, max_thickness = 1, 4
-
-                        thickness = int(min_thickness + (max_thickness - min_thickness) * fraction)
-                        color = self.POS_WEIGHT_CLR if weight > 0 else self.NEG_WEIGHT_CLR
-
-                        pygame.draw.line(
-                            self.canvas, 
-                            color,  
-                            (x,y), 
-                            (x+WIDTH, (mid_height - (self.architecture[i+1] * HEIGHT / 2) + START_Y) + k * HEIGHT),
-                            thickness
-                        )
-
-                # place a neuron:
-                self.neuron_sprites[i][j].set_position(x,y)
-                self.neuron_sprites[i][j].set_fill_color(self.DEFAULT_NEUR_CLR)
-                self.neuron_sprites[i][j].set_border_color(self.DEFAULT_NEUR_B_CLR)
-                y += HEIGHT
-
-
-class Neuron(pygame.sprite.Sprite):
-    def __init__(
-        self,
-        x=0,
-        y=0,
-        radius=14,
-        fill_color=(0,0,0),   
-        border_color=(0,0,0), 
-        border_thickness=2
-    ):
-        super().__init__()
-        self.x, self.y = x, y
-        self.radius = radius
-        
-        # Colors
-        self.fill_color = fill_color
-        self.border_color = border_color
-        self.border_thickness = border_thickness
-        
-        self.update_image()
-
-    def update_image(self):
-        size = self.radius * 2
-        self.image = pygame.Surface((size, size), pygame.SRCALPHA)
-        
-        if self.border_thickness > 0:
-            pygame.draw.circle(
-                self.image,
-                self.border_color,
-                (self.radius, self.radius),
-                self.radius
-            )
-            pygame.draw.circle(
-                self.image,
-                self.fill_color,
-                (self.radius, self.radius),
-                self.radius - self.border_thickness
-            )
-        else:
-            pygame.draw.circle(
-                self.image,
-                self.fill_color,
-                (self.radius, self.radius),
-                self.radius
-            )
-        self.rect = self.image.get_rect(center=(self.x, self.y))
-
-    def set_position(self, x, y):
-        self.x, self.y = x, y
-        self.rect.center = (x, y)
-
-    def set_fill_color(self, color):
-        self.fill_color = color
-        self.update_image()
-
-    def set_border_color(self, color):
-        self.border_color = color
-        self.update_image()
-
-    def set_activation_color(self, activation, color_low, color_high, min_val=0.0, max_val=1.0):
-        activation = max(min(activation, max_val), min_val)
-        fraction = (activation - min_val) / (max_val - min_val) if max_val != min_val else 0
-
-        #linearly interpolate yo!!!!!!!
-        r = int(color_low[0] + (color_high[0] - color_low[0]) * fraction)
-        g = int(color_low[1] + (color_high[1] - color_low[1]) * fraction)
-        b = int(color_low[2] + (color_high[2] - color_low[2]) * fraction)
-
-        self.fill_color = (r, g, b)
-        self.update_image()
-
-
-class SequentialNetwork(nn.Module):
-    def __init__(self, architecture):
-        super(SequentialNetwork, self).__init__()
-        self.layers = nn.ModuleList([
-            nn.Linear(in_features, out_features) 
-            for in_features, out_features in zip(architecture[:-1], architecture[1:])
-        ])
-        self.activation = nn.ReLU()  
-
-    def forward(self, x):
-        all_activations = []
-        all_activations.append(x.view(-1).tolist()) 
-
-        for i, layer in enumerate(self.layers):
-            x = layer(x)  
-            if i < len(self.layers) - 1:  
-                x = self.activation(x)
-            all_activations.append(x.view(-1).tolist())  
-        
-        return all_activations
\ No newline at end of file
+            y = mid_height - (architecture[i] * HEIGHT / 2) + START_Y
+            positions.append([(x, y + j * HEIGHT) for j in range(architecture[i])])
+        return positions
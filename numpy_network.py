@@ -0,0 +1,124 @@
+import numpy as np
+
+
+def parameter_shapes(architecture: list) -> list:
+    """Shapes of a SequentialNetwork's parameters, in model.parameters() order"""
+    shapes = []
+    for in_features, out_features in zip(architecture[:-1], architecture[1:]):
+        shapes += [(out_features, in_features), (out_features,)]
+    return shapes
+
+
+def genome_size(architecture: list) -> int:
+    return sum(int(np.prod(shape)) for shape in parameter_shapes(architecture))
+
+
+def unflatten(genomes: np.ndarray, architecture: list) -> list:
+    """Splits (count, genome_size) flat genomes into per parameter views of (count, *shape)"""
+    params = []
+    offset = 0
+    for shape in parameter_shapes(architecture):
+        size = int(np.prod(shape))
+        params.append(genomes[:, offset:offset + size].reshape(len(genomes), *shape))
+        offset += size
+    return params
+
+
+class NumpyNetwork:
+    """Inference only copy of a SequentialNetwork in NumPy, for the tiny policies where torch's
+    per call overhead costs more than the maths.
+
+    All parameters live in one contiguous float32 array in model.parameters() order, the same
+    layout as a neuroevolution genome, and every layer writes into a preallocated buffer.
+    forward returns one of those buffers, copy it to keep it past the next call."""
+
+    def __init__(self, architecture: list, params: np.ndarray = None):
+        self.architecture = list(architecture)
+        self.params = np.zeros(genome_size(self.architecture), dtype=np.float32)
+        views = unflatten(self.params.reshape(1, -1), self.architecture)
+        self.weights = [view[0] for view in views[0::2]]
+        self.biases = [view[0] for view in views[1::2]]
+        self.outputs = [np.zeros(size, dtype=np.float32) for size in self.architecture[1:]]
+        self._batch_outputs = []
+        if params is not None:
+            self.load(params)
+
+    @classmethod
+    def from_model(cls, model) -> "NumpyNetwork":
+        architecture = [model.layers[0].in_features] + [layer.out_features for layer in model.layers]
+        network = cls(architecture)
+        network.load_state_dict(model.state_dict())
+        return network
+
+    def load(self, params: np.ndarray):
+        """Copies in a flat genome, the weight and bias views stay valid"""
+        self.params[:] = params
+
+    def load_state_dict(self, state_dict: dict):
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            weight[:] = state_dict[f"layers.{i}.weight"].detach().cpu().numpy()
+            bias[:] = state_dict[f"layers.{i}.bias"].detach().cpu().numpy()
+
+    def forward(self, x) -> np.ndarray:
+        """Takes a single observation or a (batch, inputs) array, returns the output logits"""
+        x = np.asarray(x, dtype=np.float32)
+        outputs = self.outputs if x.ndim == 1 else self._batch_buffers(len(x))
+        last = len(self.weights) - 1
+        for i, (weight, bias, out) in enumerate(zip(self.weights, self.biases, outputs)):
+            np.dot(x, weight.T, out=out)
+            out += bias
+            if i < last:
+                np.maximum(out, 0, out=out)
+            x = out
+        return x
+
+    def predict(self, observations) -> np.ndarray:
+        return self.forward(observations)
+
+    def _batch_buffers(self, batch: int) -> list:
+        # grown to the largest batch seen, smaller batches use the leading rows
+        if not self._batch_outputs or len(self._batch_outputs[0]) < batch:
+            self._batch_outputs = [np.zeros((batch, size), dtype=np.float32) for size in self.architecture[1:]]
+        return [out[:batch] for out in self._batch_outputs]
+
+
+class NumpyPopulation:
+    """A population of same-shape networks evaluated together, one genome per row. Every
+    network gets its own observation (or its own batch of them) and all of them go through
+    each layer as one stacked matmul."""
+
+    def __init__(self, genomes: np.ndarray, architecture: list):
+        self.architecture = list(architecture)
+        self.genomes = np.ascontiguousarray(genomes, dtype=np.float32)
+        params = unflatten(self.genomes, self.architecture)
+        # (count, in, out) so the observations multiply from the left
+        self.weights = [np.ascontiguousarray(weight.transpose(0, 2, 1)) for weight in params[0::2]]
+        self.biases = [bias[:, None, :] for bias in params[1::2]]
+        self._buffers = {}
+
+    def __len__(self) -> int:
+        return len(self.genomes)
+
+    def forward(self, observations) -> np.ndarray:
+        """(count, inputs) observations give (count, outputs) logits,
+        (count, batch, inputs) give (count, batch, outputs)"""
+        x = np.asarray(observations, dtype=np.float32)
+        single = x.ndim == 2
+        if single:
+            x = x[:, None, :]
+        outputs = self._buffers.get(x.shape[1])
+        if outputs is None:
+            outputs = [np.zeros((len(self), x.shape[1], size), dtype=np.float32) for size in self.architecture[1:]]
+            self._buffers[x.shape[1]] = outputs
+        last = len(self.weights) - 1
+        for i, (weight, bias, out) in enumerate(zip(self.weights, self.biases, outputs)):
+            np.matmul(x, weight, out=out)
+            out += bias
+            if i < last:
+                np.maximum(out, 0, out=out)
+            x = out
+        return x[:, 0] if single else x
+
+    def act(self, observations) -> np.ndarray:
+        """Greedy action of every network for its observation"""
+        return self.forward(observations).argmax(axis=-1)
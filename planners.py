@@ -0,0 +1,169 @@
+import heapq
+from snake import SnakeEnvironment
+
+# Scripted agents that read a SnakeEnvironment's state directly and return the action to
+# take next, for generating expert data (see expert_data.py) rather than for play.
+
+
+def hamiltonian_cycle(width: int, height: int) -> list:
+    """Cells (y * width + x) of a cycle through every cell of the board: row 0 left to
+    right, the other rows snaking over columns 1.., back up column 0. Needs an even height,
+    boards with an odd height and an even width get the transposed cycle."""
+    if height % 2 == 0:
+        cycle = [x for x in range(width)]
+        for y in range(1, height):
+            xs = range(width - 1, 0, -1) if y % 2 else range(1, width)
+            cycle += [y * width + x for x in xs]
+        return cycle + [y * width for y in range(height - 1, 0, -1)]
+    if width % 2 == 0:
+        return [(cell % height) * width + cell // height for cell in hamiltonian_cycle(height, width)]
+    raise Exception(f"A {width}x{height} board has no Hamiltonian cycle, one side must be even")
+
+
+def _directions(env: SnakeEnvironment) -> dict:
+    # action value by cell offset, like SnakeEnvironment._DELTAS the other way around
+    return {-env._width: 0, 1: 1, -1: 2, env._width: 3}
+
+
+class AStarAgent:
+    """Greedy A* to the food. Body pieces count as walls until the step they will have
+    left, so the path may run through where the tail is now. A path is planned once per
+    food and followed as long as the snake does what it said, only a new food, a reset or
+    an unexpected move plans again.
+
+    A step of the path is only taken when it is a move HamiltonianAgent could make too,
+    the cycle move or a shortcut that keeps the body in cycle order. Otherwise, or without
+    a path, the snake follows the board's Hamiltonian cycle (shortcuts included), so it
+    never traps itself. Boards without a cycle take every path step and fall back to a
+    random move that keeps at least score + 1 cells in reach
+    (SnakeEnvironment.sample_safe_action lookahead)."""
+
+    def __init__(self, env: SnakeEnvironment):
+        self.env = env
+        self._directions = _directions(env)
+        self._cycle = HamiltonianAgent(env) if env._width % 2 == 0 or env._height % 2 == 0 else None
+        # cells still to visit, next one last
+        self._path = []
+        self._plan = None
+
+    def act(self) -> int:
+        env = self.env
+        width = env._width
+        head = env._head_y * width + env._head_x
+        food = env._food_y * width + env._food_x if env._food_x >= 0 else -1
+        # only the cycle move is allowed, no need to plan
+        if self._cycle is not None and self._cycle.reach() == 1:
+            self._path = []
+            return self._cycle.act()
+        plan = (env.episode_seed, food, head)
+        if not self._path or self._plan != plan:
+            self._path = self._search(head, food) if food >= 0 else []
+        if self._path and self._cycle is not None and not self._cycle.allows(self._path[-1]):
+            self._path = []
+        if not self._path:
+            if self._cycle is not None:
+                return self._cycle.act()
+            return env.sample_safe_action(env.score + 1).value
+        cell = self._path.pop()
+        self._plan = (env.episode_seed, food, cell)
+        return self._directions[cell - head]
+
+    def _search(self, head: int, food: int) -> list:
+        env = self.env
+        width, height = env._width, env._height
+        # body piece i leaves its cell score - i steps from now, without eating on the way.
+        # Filled from the tail so the newest of stacked pieces wins.
+        release = {}
+        for i in range(env.score - 1, -1, -1):
+            release[env._body_cell(i)] = env.score - i
+        food_x, food_y = food % width, food // width
+
+        parents = {head: None}
+        costs = {head: 0}
+        frontier = [(abs(food_x - env._head_x) + abs(food_y - env._head_y), 0, head)]
+        while frontier:
+            _, cost, cell = heapq.heappop(frontier)
+            if cell == food:
+                path = []
+                while cell != head:
+                    path.append(cell)
+                    cell = parents[cell]
+                return path
+            if cost > costs[cell]:
+                continue
+            x = cell % width
+            cost += 1
+            for neighbour, inside in (
+                (cell - width, cell >= width), (cell + 1, x < width - 1),
+                (cell - 1, x > 0), (cell + width, cell < width * (height - 1)),
+            ):
+                if not inside or release.get(neighbour, 0) >= cost or cost >= costs.get(neighbour, cost + 1):
+                    continue
+                costs[neighbour] = cost
+                parents[neighbour] = cell
+                estimate = abs(food_x - neighbour % width) + abs(food_y - neighbour // width)
+                heapq.heappush(frontier, (cost + estimate, cost, neighbour))
+        return []
+
+
+class HamiltonianAgent:
+    """Follows a Hamiltonian cycle of the board, which never dies, cutting across it towards
+    the food while the snake is short. A shortcut never jumps past the food and keeps the
+    head at least score + 3 cells (along the cycle) behind the tail, so the body always
+    stays in cycle order behind the head. Shortcuts stop once the snake fills half the board."""
+
+    def __init__(self, env: SnakeEnvironment, shortcuts: bool = True):
+        self.env = env
+        self.shortcuts = shortcuts
+        self._directions = _directions(env)
+        self.cycle = hamiltonian_cycle(env._width, env._height)
+        self._order = [0] * len(self.cycle)
+        for i, cell in enumerate(self.cycle):
+            self._order[cell] = i
+
+    def act(self) -> int:
+        env = self.env
+        width, cells = env._width, len(self.cycle)
+        order = self._order
+        head = env._head_y * width + env._head_x
+        position = order[head]
+        target = self.cycle[(position + 1) % cells]
+
+        reach = self.reach()
+        if reach > 1:
+            best = 1
+            x = env._head_x
+            for neighbour, inside in (
+                (head - width, head >= width), (head + 1, x < width - 1),
+                (head - 1, x > 0), (head + width, head < cells - width),
+            ):
+                if inside and not env._occupied(neighbour):
+                    distance = (order[neighbour] - position) % cells
+                    if best < distance <= reach:
+                        best, target = distance, neighbour
+        return self._directions[target - head]
+
+    def reach(self) -> int:
+        """How many cells along the cycle the head may move ahead this step, 1 when only the
+        cycle move is allowed"""
+        env = self.env
+        cells = len(self.cycle)
+        if not self.shortcuts or env._food_x < 0 or env.score >= cells // 2:
+            return 1
+        order = self._order
+        position = order[env._head_y * env._width + env._head_x]
+        food = env._food_y * env._width + env._food_x
+        tail_distance = (order[env._body_cell(env.score - 1)] - position) % cells if env.score else cells
+        return max(1, min(tail_distance - env.score - 3, (order[food] - position) % cells))
+
+    def allows(self, cell: int) -> bool:
+        """Whether moving the head to cell, a free neighbour, keeps the body in cycle order"""
+        env = self.env
+        distance = (self._order[cell] - self._order[env._head_y * env._width + env._head_x]) % len(self.cycle)
+        return 1 <= distance <= self.reach()
+
+
+AGENTS = {
+    "astar": AStarAgent,
+    "hamiltonian": HamiltonianAgent,
+}
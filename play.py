@@ -1,40 +1,61 @@
+import os
+import time
 from snake import SnakeEnvironment, Action
+from profiler import profiler, instrument_snake
+from metrics import EpisodeMetrics
 import pygame
 
 class SnakeGame: 
     PURPLE = (99, 5, 102)
     DARK_GRAY = (20, 20, 20)
-    def __init__(self):
+    def __init__(self, metrics: EpisodeMetrics = None):
         self.env = SnakeEnvironment()
+        self.metrics = metrics
         x,y = self.env.get_canavs_dim()
         pygame.init()
         self.window = pygame.display.set_mode((x, y+50))
         pygame.display.set_caption('Snake Game')
         self.score = 0
         self.action = self.env.sample_action()
+        self.header = pygame.Rect(0, 0, x, 50)
+        self.dirty_rects = []
     
     def run(self):
         running = True
         time_delay = 100
         playing = True
-        count = 0
+        if self.metrics is not None:
+            self.metrics.start()
 
         while running:
             
-            pygame.time.delay(time_delay)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+            with profiler.phase("delay"):
+                pygame.time.delay(time_delay)
+            with profiler.phase("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
 
-            if playing:
+            # a closed window ends the game before another step is played
+            if playing and running:
                 running = self._playing()
+                if not running and self.metrics is not None:
+                    self.metrics.end(self.env)
 
-            score_txt = "Score: " + str(self.score)
-            self._draw_text(score_txt, pygame.font.SysFont("ocraii", 35), (255,255,255), 10, 10)    
+            with profiler.phase("header"):
+                score_txt = "Score: " + str(self.score)
+                self.window.fill((0, 0, 0), self.header)
+                self._draw_text(score_txt, pygame.font.SysFont("ocraii", 35), (255,255,255), 10, 10)    
+                self.dirty_rects.append(self.header)
 
-            pygame.display.update()
-            count += 1
-            print(count)
+            with profiler.phase("display_update"):
+                pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
+            profiler.count("frames")
+            profiler.tick()
+
+        if playing and not self.env.lost and self.metrics is not None:
+            self.metrics.end(self.env, "quit")
 
     def _baby_menu(self) -> bool:
         pass
@@ -52,17 +73,23 @@ class SnakeGame:
         elif key[pygame.K_LEFT]:
             self.action = Action.LEFT
 
+        start = time.perf_counter()
         observation, reward, loss = self.env.step(self.action)
-
-        print(observation)
+        step_seconds = time.perf_counter() - start
 
         self.score += reward
+        profiler.count("steps")
+        profiler.count("foods", reward)
+        if self.metrics is not None:
+            self.metrics.step(step_seconds)
 
-        snake_canvas = self.env.render_frame()
-        self.window.fill((0, 0, 0))
-        self.window.blit(snake_canvas, (0, 50))
+        # only copy the cells that changed
+        snake_canvas, rects = self.env.render_dirty_frame()
+        for rect in rects:
+            self.dirty_rects.append(self.window.blit(snake_canvas, rect.move(0, 50), rect))
         
         if loss:
+            profiler.count("episodes")
             return False
         return True
 
@@ -76,5 +103,14 @@ class SnakeGame:
         img = font.render(text, True, color)
         self.window.blit(img, (x, y))
 
-game = SnakeGame()
-game.run()
+if __name__ == "__main__":
+    # SNAKE_PROFILE=1 / SNAKE_PROFILE_TRACE=trace.json, see profiler.Profiler
+    profiler.enable_from_env()
+    instrument_snake()
+    # SNAKE_METRICS=episodes.jsonl (or .csv) streams per-episode stats, see metrics.EpisodeMetrics
+    metrics = EpisodeMetrics(os.environ["SNAKE_METRICS"]) if os.environ.get("SNAKE_METRICS") else None
+    game = SnakeGame(metrics)
+    game.run()
+    if metrics is not None:
+        metrics.close()
+        print(metrics.summary())
@@ -0,0 +1,142 @@
+import os
+import struct
+import numpy as np
+from numpy_network import genome_size, unflatten
+
+# A whole run of SequentialNetwork populations in one flat file:
+#
+#   store file: "SNAKEPOP" + version + layer count + architecture, padded to 16 bytes,
+#       then float32 genomes back to back, one row of genome_size(architecture) each
+#   index file (<path>.idx): generation u64, first row u64, row count u64 per append
+#   fitness file (<path>.fit): one float64 per row, NaN where none was given
+#
+# Appending a generation only writes to the ends of the three files.
+
+MAGIC = b"SNAKEPOP"
+VERSION = 1
+_INDEX_RECORD = struct.Struct("<QQQ")
+
+
+class PopulationStore:
+    """Appendable, memory-mapped store of flat genomes for one architecture.
+
+    Reads are views into the mapped file (copy-on-write, so torch can wrap them without a
+    copy or a read-only warning), only the pages of the genomes actually used are read."""
+
+    def __init__(self, path: str, architecture: list = None):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            if architecture is None:
+                raise Exception(f"{path} does not exist, an architecture is needed to create it")
+            header = struct.pack(f"<8sII{len(architecture)}I", MAGIC, VERSION, len(architecture), *architecture)
+            header += bytes(-len(header) % 16)
+            with open(path, "wb") as f:
+                f.write(header)
+            for suffix in (".idx", ".fit"):
+                open(path + suffix, "wb").close()
+
+        with open(path, "rb") as f:
+            magic, version, layers = struct.unpack("<8sII", f.read(16))
+            if magic != MAGIC or version != VERSION:
+                raise Exception(f"{path} is not a version {VERSION} population store")
+            stored = list(struct.unpack(f"<{layers}I", f.read(4 * layers)))
+        if architecture is not None and list(architecture) != stored:
+            raise Exception(f"{path} holds {stored} networks, not {list(architecture)}")
+        self.architecture = stored
+        self.genome_size = genome_size(stored)
+        self._header_size = 16 + 4 * layers + (-(16 + 4 * layers) % 16)
+        self._row_bytes = self.genome_size * 4
+        self._rows = (os.path.getsize(path) - self._header_size) // self._row_bytes
+        self._index = [_INDEX_RECORD.unpack(record) for record in _records(path + ".idx", _INDEX_RECORD.size)]
+        self._genomes = None
+        self._fitness = None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def generations(self) -> list:
+        return [generation for generation, _, _ in self._index]
+
+    def append(self, genomes: np.ndarray, generation: int = None, fitness: np.ndarray = None) -> int:
+        """Adds a (count, genome_size) population as a new generation, numbered one past the
+        last one unless given, returns its number"""
+        genomes = np.ascontiguousarray(genomes, dtype=np.float32).reshape(-1, self.genome_size)
+        if generation is None:
+            generation = self._index[-1][0] + 1 if self._index else 0
+        if fitness is None:
+            fitness = np.full(len(genomes), np.nan)
+        fitness = np.ascontiguousarray(fitness, dtype=np.float64).reshape(len(genomes))
+
+        with open(self.path, "ab") as f:
+            f.write(genomes.tobytes())
+        with open(self.path + ".fit", "ab") as f:
+            f.write(fitness.tobytes())
+        record = (generation, self._rows, len(genomes))
+        with open(self.path + ".idx", "ab") as f:
+            f.write(_INDEX_RECORD.pack(*record))
+        self._index.append(record)
+        self._rows += len(genomes)
+        # mapped again on the next read to take in the new rows
+        self._genomes = None
+        self._fitness = None
+        return generation
+
+    def genomes(self) -> np.ndarray:
+        """All (rows, genome_size) genomes as one mapped array"""
+        if self._genomes is None:
+            self._genomes = _map(self.path, np.float32, self._header_size, (self._rows, self.genome_size))
+            self._fitness = _map(self.path + ".fit", np.float64, 0, (self._rows,))
+        return self._genomes
+
+    def fitness(self) -> np.ndarray:
+        self.genomes()
+        return self._fitness
+
+    def genome(self, row: int) -> np.ndarray:
+        return self.genomes()[row]
+
+    def generation(self, generation: int) -> tuple:
+        """(genomes, fitness) views of one generation, the last one when it was appended twice"""
+        for number, first, count in reversed(self._index):
+            if number == generation:
+                return self.genomes()[first:first + count], self.fitness()[first:first + count]
+        raise Exception(f"generation {generation} is not in {self.path}")
+
+    def best(self, generation: int = None) -> np.ndarray:
+        """Fittest genome of a generation, or of the whole store"""
+        if generation is None:
+            genomes, fitness = self.genomes(), self.fitness()
+        else:
+            genomes, fitness = self.generation(generation)
+        return genomes[np.nanargmax(fitness)]
+
+    def state_dict(self, row: int) -> dict:
+        """SequentialNetwork state_dict whose tensors share memory with the mapped file, for
+        VisualNN.change_state or model.load_state_dict"""
+        import torch
+        params = unflatten(self.genome(row).reshape(1, -1), self.architecture)
+        state_dict = {}
+        for i in range(len(self.architecture) - 1):
+            state_dict[f"layers.{i}.weight"] = torch.from_numpy(params[2 * i][0])
+            state_dict[f"layers.{i}.bias"] = torch.from_numpy(params[2 * i + 1][0])
+        return state_dict
+
+
+def state_dict_to_genome(state_dict: dict) -> np.ndarray:
+    """Flattens a SequentialNetwork state_dict (VisualNN.get_model_state) into a genome"""
+    return np.concatenate([value.detach().cpu().numpy().ravel() for value in state_dict.values()]).astype(np.float32)
+
+
+def _records(path: str, size: int) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    return [data[i:i + size] for i in range(0, len(data) - size + 1, size)]
+
+
+def _map(path: str, dtype, offset: int, shape: tuple) -> np.ndarray:
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=shape)
@@ -0,0 +1,184 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Profiler:
+    """Opt-in per-phase timings and counters.
+
+    Disabled it costs nothing in the simulation: hot methods are only wrapped with timers by
+    instrument() once profiling is enabled, and phase() / count() / tick() in the game loops
+    return straight away. Enabled it keeps per-phase totals, prints a summary every
+    summary_every seconds and, with a trace_path, writes every timed call as a Chrome trace
+    (chrome://tracing or ui.perfetto.dev) when closed.
+
+    Turned on from the environment by enable_from_env():
+        SNAKE_PROFILE=1                 periodic summaries
+        SNAKE_PROFILE_EVERY=5           seconds between summaries (0 for only the final one)
+        SNAKE_PROFILE_TRACE=trace.json  also write a Chrome trace
+    """
+
+    MAX_TRACE_EVENTS = 1_000_000
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.summary_every = 5.0
+        self._wrapped = []
+        self._reset_stats()
+
+    def enable(self, trace_path: str = None, summary_every: float = 5.0):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.trace_path = trace_path
+        self.summary_every = summary_every
+        self._reset_stats()
+        atexit.register(self.close)
+
+    def enable_from_env(self):
+        if os.environ.get("SNAKE_PROFILE") or os.environ.get("SNAKE_PROFILE_TRACE"):
+            self.enable(
+                trace_path=os.environ.get("SNAKE_PROFILE_TRACE"),
+                summary_every=float(os.environ.get("SNAKE_PROFILE_EVERY", 5)),
+            )
+
+    def instrument(self, cls, names: list):
+        """Times every call to the given methods of cls as '<cls>.<name>'. Does nothing while
+        disabled, so call it after enable()."""
+        if not self.enabled:
+            return
+        for name in names:
+            original = cls.__dict__[name]
+            setattr(cls, name, self._timed(f"{cls.__name__}.{name}", original))
+            self._wrapped.append((cls, name, original))
+
+    def phase(self, name: str):
+        """Context manager timing a block of a loop as one phase"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._phase(name)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def tick(self):
+        """Called once per loop iteration, samples the counters for the trace and prints the
+        summary when it is due"""
+        if not self.enabled:
+            return
+        if self.trace_path and len(self._counter_events) < self.MAX_TRACE_EVENTS:
+            self._counter_events.append((time.perf_counter_ns(), dict(self.counters)))
+        if self.summary_every and time.perf_counter() - self._window_start >= self.summary_every:
+            self.print_summary()
+
+    def print_summary(self):
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        print(f"--- profile: last {elapsed:.1f}s ---")
+        rates = ", ".join(
+            f"{name} {total - self._window_counters.get(name, 0)} ({(total - self._window_counters.get(name, 0)) / elapsed:.1f}/s)"
+            for name, total in sorted(self.counters.items())
+        )
+        if rates:
+            print(rates)
+        print(f"{'phase':<40} {'calls':>8} {'total ms':>10} {'mean us':>10} {'max us':>10} {'% wall':>7}")
+        for name, (calls, total, longest) in sorted(self._window.items(), key=lambda item: -item[1][1]):
+            print(
+                f"{name:<40} {calls:>8} {total / 1e6:>10.2f} {total / calls / 1e3:>10.2f} "
+                f"{longest / 1e3:>10.2f} {total / 1e9 / elapsed:>7.1%}"
+            )
+        self._window = {}
+        self._window_counters = dict(self.counters)
+        self._window_start = now
+
+    def close(self):
+        """Restores the instrumented methods, prints the last summary and writes the trace"""
+        if not self.enabled:
+            return
+        for cls, name, original in reversed(self._wrapped):
+            setattr(cls, name, original)
+        self._wrapped = []
+        if self._window:
+            self.print_summary()
+        if self.trace_path:
+            self.write_trace(self.trace_path)
+        self.enabled = False
+
+    def write_trace(self, path: str):
+        pid = os.getpid()
+        events = [
+            {"name": name, "ph": "X", "ts": start / 1e3, "dur": duration / 1e3, "pid": pid, "tid": tid}
+            for name, start, duration, tid in self._events
+        ]
+        events += [
+            {"name": "counters", "ph": "C", "ts": at / 1e3, "pid": pid, "args": counters}
+            for at, counters in self._counter_events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def _reset_stats(self):
+        self.counters = {}
+        # name -> (calls, total ns, longest ns), since the last summary
+        self._window = {}
+        self._window_counters = {}
+        self._window_start = time.perf_counter()
+        self._events = []
+        self._counter_events = []
+
+    def _record(self, name: str, start: int, end: int):
+        duration = end - start
+        calls, total, longest = self._window.get(name, (0, 0, 0))
+        self._window[name] = (calls + 1, total + duration, max(longest, duration))
+        if self.trace_path and len(self._events) < self.MAX_TRACE_EVENTS:
+            self._events.append((name, start, duration, threading.get_ident()))
+
+    def _timed(self, name: str, func):
+        clock = time.perf_counter_ns
+        record = self._record
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, clock())
+        return wrapper
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter_ns())
+
+
+_NULL_PHASE = contextlib.nullcontext()
+
+# the one profiler the game loops and instrumented classes report to
+profiler = Profiler()
+
+# the steps of SnakeEnvironment.step and its rendering, see instrument_snake
+SNAKE_PHASES = [
+    "step", "_move_head", "_check_eat", "_check_out_of_bounds", "_move_body", "_place_food",
+    "_refresh_observation", "_build_observation", "render_frame", "render_dirty_frame",
+]
+VISUAL_NN_PHASES = ["forward", "render_frame", "_display_activation_step", "_draw_network", "change_state"]
+
+
+def instrument_snake():
+    from snake import SnakeEnvironment
+    profiler.instrument(SnakeEnvironment, SNAKE_PHASES)
+
+
+def instrument_visual_nn():
+    from nn_visualizer import VisualNN
+    profiler.instrument(VisualNN, VISUAL_NN_PHASES)
@@ -0,0 +1,163 @@
+import os
+import struct
+import numpy as np
+from snake import SnakeEnvironment
+
+# An episode is fully determined by the seed its reset was given and the actions taken,
+# so that is all a recording keeps:
+#
+#   episodes file: "SNAKEREC" + version + board width u16 + height u16, then one record
+#       per episode
+#       seed u64, steps u32, score u32, ceil(steps / 4) bytes of actions,
+#       four 2 bit actions per byte, step i in bits 2 * (i % 4)
+#   index file (<path>.idx): u64 offset of every record, appended with it
+#
+# so a 1000 step episode takes 266 bytes.
+
+MAGIC = b"SNAKEREC"
+VERSION = 2
+_FILE_HEADER = struct.Struct("<8sIHH")
+_RECORD_HEADER = struct.Struct("<QII")
+
+
+def pack_actions(actions) -> bytes:
+    actions = np.asarray([getattr(a, "value", a) for a in actions], dtype=np.uint8)
+    if ((actions > 3)).any():
+        raise Exception("Invalid direction, must be an int 0-3")
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).tobytes()
+
+
+def unpack_actions(packed, steps: int) -> np.ndarray:
+    packed = np.frombuffer(packed, dtype=np.uint8)
+    return ((packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3).reshape(-1)[:steps]
+
+
+class EpisodeWriter:
+    """Appends episodes to a recording, creating it when it does not exist yet. Every
+    episode of a recording is played on the same board, grid_size (the standard one by
+    default) for a new recording and the stored one when appending."""
+
+    def __init__(self, path: str, grid_size: tuple = None):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if new:
+            self.grid_size = tuple(grid_size or SnakeEnvironment.GRID_SIZE)
+        else:
+            with open(path, "rb") as f:
+                self.grid_size = _read_grid_size(f.read(_FILE_HEADER.size), path)
+            if grid_size is not None and tuple(grid_size) != self.grid_size:
+                raise Exception(f"{path} holds episodes on a {self.grid_size} board, not {tuple(grid_size)}")
+        self._file = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        if new:
+            self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, *self.grid_size))
+            self._index.truncate(0)
+        self._offset = self._file.tell()
+
+    def write(self, seed: int, actions, score: int = 0):
+        packed = pack_actions(actions)
+        self._file.write(_RECORD_HEADER.pack(seed, len(actions), score))
+        self._file.write(packed)
+        self._index.write(struct.pack("<Q", self._offset))
+        self._offset += _RECORD_HEADER.size + len(packed)
+
+    def record(self, env: SnakeEnvironment, actions):
+        """Writes the episode env is playing (or just finished) given the actions it took"""
+        if env.grid_size != self.grid_size:
+            raise Exception(f"{self.path} holds episodes on a {self.grid_size} board, not {env.grid_size}")
+        self.write(env.episode_seed, actions, env.score)
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class EpisodeReader:
+    """Memory-maps a recording, episodes are read straight from the page cache and any step
+    of any of them is rebuilt by replaying it headless on a board of the recording's
+    grid_size"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        self.grid_size = _read_grid_size(self._data[:_FILE_HEADER.size].tobytes(), path)
+        index_path = path + ".idx"
+        if os.path.exists(index_path) and os.path.getsize(index_path) > 0:
+            self._offsets = np.memmap(index_path, dtype="<u8", mode="r")
+        else:
+            self._offsets = self._scan()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def header(self, episode: int) -> tuple:
+        """(seed, steps, score) of an episode"""
+        return _RECORD_HEADER.unpack_from(self._data, int(self._offsets[episode]))
+
+    def actions(self, episode: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """Actions of steps start..stop as uint8, only the bytes holding them are touched"""
+        _, steps, _ = self.header(episode)
+        stop = steps if stop is None else min(stop, steps)
+        if start >= stop:
+            return np.zeros(0, dtype=np.uint8)
+        offset = int(self._offsets[episode]) + _RECORD_HEADER.size
+        packed = self._data[offset + start // 4:offset + (stop + 3) // 4]
+        return unpack_actions(packed, stop - start // 4 * 4)[start % 4:]
+
+    def replay(self, episode: int, env: SnakeEnvironment = None):
+        """Steps env (a fresh features env by default) through the episode, yields what every
+        step returned"""
+        seed, _, _ = self.header(episode)
+        env = self._replay_env(env)
+        env.reset(seed)
+        for action in self.actions(episode).tolist():
+            yield env.step(action)
+
+    def seek(self, episode: int, step: int, env: SnakeEnvironment = None) -> SnakeEnvironment:
+        """Returns env as it was after the first step steps of the episode"""
+        seed, _, _ = self.header(episode)
+        env = self._replay_env(env)
+        env.reset(seed)
+        for action in self.actions(episode, 0, step).tolist():
+            env.step(action)
+        return env
+
+    def close(self):
+        # np.memmap has no close, dropping the last reference unmaps the file
+        self._data = None
+        self._offsets = None
+
+    def _replay_env(self, env: SnakeEnvironment) -> SnakeEnvironment:
+        if env is None:
+            return SnakeEnvironment(grid_size=self.grid_size)
+        if env.grid_size != self.grid_size:
+            raise Exception(f"{self.path} holds episodes on a {self.grid_size} board, not {env.grid_size}")
+        return env
+
+    def _scan(self) -> np.ndarray:
+        """Rebuilds the offsets of a recording whose index file went missing"""
+        offsets = []
+        offset = _FILE_HEADER.size
+        while offset < len(self._data):
+            offsets.append(offset)
+            _, steps, _ = _RECORD_HEADER.unpack_from(self._data, offset)
+            offset += _RECORD_HEADER.size + (steps + 3) // 4
+        return np.array(offsets, dtype=np.uint64)
+
+
+def _read_grid_size(header: bytes, path: str) -> tuple:
+    if len(header) < _FILE_HEADER.size:
+        raise Exception(f"{path} is not a version {VERSION} episode recording")
+    magic, version, width, height = _FILE_HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise Exception(f"{path} is not a version {VERSION} episode recording")
+    return (width, height)
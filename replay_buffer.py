@@ -0,0 +1,155 @@
+from collections import namedtuple
+import numpy as np
+
+# a sampled batch, one row per transition. indices are the buffer slots the rows came from
+# (what update_priorities takes), weights the importance sampling corrections, all ones
+# when sampling uniformly
+Batch = namedtuple("Batch", "observations actions rewards next_observations dones indices weights")
+
+
+class ReplayBuffer:
+    """Fixed size ring of transitions, one preallocated NumPy array per field.
+
+    add and sample work on whole batches: a step of a VecSnakeEnvironment goes in with one
+    call and a training batch comes out with one fancy index per field. Sampled batches are
+    written into buffers that are reused, so a Batch is only valid until the next sample."""
+
+    def __init__(self, capacity: int, observation_shape: tuple = (12,), seed: int = None):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.observations = np.zeros((capacity, *observation_shape), dtype=np.float32)
+        self.next_observations = np.zeros((capacity, *observation_shape), dtype=np.float32)
+        # int64 and float32 so torch.from_numpy gives gather indices and loss terms directly
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self._next = 0
+        self._size = 0
+        self._batch = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, observations, actions, rewards, next_observations, dones) -> np.ndarray:
+        """Stores a batch of transitions over the oldest ones, returns the slots they went to"""
+        shape = self.observations.shape[1:]
+        actions = np.asarray(actions).reshape(-1)
+        # only the newest capacity transitions would survive anyway
+        keep = slice(max(0, len(actions) - self.capacity), None)
+        count = len(actions[keep])
+        slots = (self._next + np.arange(count)) % self.capacity
+        self.observations[slots] = np.asarray(observations).reshape(-1, *shape)[keep]
+        self.next_observations[slots] = np.asarray(next_observations).reshape(-1, *shape)[keep]
+        self.actions[slots] = actions[keep]
+        self.rewards[slots] = np.asarray(rewards).reshape(-1)[keep]
+        self.dones[slots] = np.asarray(dones).reshape(-1)[keep]
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        return slots
+
+    def sample(self, batch_size: int) -> Batch:
+        if self._size == 0:
+            raise Exception("Cannot sample from an empty replay buffer")
+        indices = self.rng.integers(0, self._size, batch_size)
+        batch = self._gather(indices)
+        batch.weights[:] = 1
+        return batch
+
+    def _gather(self, indices: np.ndarray) -> Batch:
+        batch = self._batch_buffers(len(indices))
+        batch.indices[:] = indices
+        for field in ("observations", "actions", "rewards", "next_observations", "dones"):
+            np.take(getattr(self, field), indices, axis=0, out=getattr(batch, field))
+        return batch
+
+    def _batch_buffers(self, batch_size: int) -> Batch:
+        if self._batch is None or len(self._batch.indices) != batch_size:
+            self._batch = Batch(
+                np.zeros((batch_size, *self.observations.shape[1:]), dtype=np.float32),
+                np.zeros(batch_size, dtype=np.int64),
+                np.zeros(batch_size, dtype=np.float32),
+                np.zeros((batch_size, *self.observations.shape[1:]), dtype=np.float32),
+                np.zeros(batch_size, dtype=np.float32),
+                np.zeros(batch_size, dtype=np.int64),
+                np.zeros(batch_size, dtype=np.float32),
+            )
+        return self._batch
+
+
+class SumTree:
+    """Binary tree over capacity priorities where every node holds the sum of its children,
+    laid out in one array (root at 1, children of n at 2n and 2n + 1). Updating a batch of
+    leaves and finding the leaves for a batch of prefix sums are both one NumPy operation
+    per level."""
+
+    def __init__(self, capacity: int):
+        self.leaves = 1 << max(0, (capacity - 1).bit_length())
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def __getitem__(self, indices) -> np.ndarray:
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def update(self, indices, priorities):
+        nodes = self.leaves + np.asarray(indices)
+        # with repeated indices the last priority wins, like a plain assignment
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes >> 1)
+        for _ in range(self.depth):
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes >> 1)
+
+    def find(self, values) -> np.ndarray:
+        """Leaf index of every prefix sum in values, each in [0, total)"""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            right = values >= self.tree[left]
+            values -= np.where(right, self.tree[left], 0)
+            nodes = left + right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Proportional prioritized replay: a transition is sampled with probability
+    p ** alpha / sum, p being its last TD error plus epsilon, and new ones start at the
+    highest priority seen so they are replayed at least once. weights undo the bias with
+    exponent beta, scaled so the largest in the batch is 1."""
+
+    def __init__(self, capacity: int, observation_shape: tuple = (12,), seed: int = None,
+                 alpha: float = 0.6, beta: float = 0.4, epsilon: float = 1e-3):
+        super().__init__(capacity, observation_shape, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.tree = SumTree(capacity)
+        self._max_priority = 1.0
+
+    def add(self, observations, actions, rewards, next_observations, dones) -> np.ndarray:
+        slots = super().add(observations, actions, rewards, next_observations, dones)
+        self.tree.update(slots, self._max_priority)
+        return slots
+
+    def sample(self, batch_size: int) -> Batch:
+        if self._size == 0:
+            raise Exception("Cannot sample from an empty replay buffer")
+        # one draw from each of batch_size equal slices of the total, fewer repeats than
+        # independent draws
+        total = self.tree.total
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        indices = np.minimum(self.tree.find(np.minimum(values, np.nextafter(total, 0))), self._size - 1)
+        batch = self._gather(indices)
+        probabilities = self.tree[indices] / total
+        weights = (self._size * probabilities) ** -self.beta
+        batch.weights[:] = weights / weights.max()
+        return batch
+
+    def update_priorities(self, indices, td_errors):
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities)
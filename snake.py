@@ -1,6 +1,7 @@
-from snake_sprites import *
 import random
-import math
+import numpy as np
+from array import array
+from collections import namedtuple
 from enum import Enum
 
 class Action(Enum):
@@ -9,6 +10,11 @@ class Action(Enum):
     LEFT = 2
     DOWN = 3
 
+# what the board looks like at one moment, enough to draw it without the environment.
+# Cells are y * width + x, body runs from behind the head to the tail, food is -1 when
+# the board is full
+Snapshot = namedtuple("Snapshot", "width height head food body score lost head_dead hit_cell hit_tail")
+
 class SnakeEnvironment:
     LIGHTBLUE = (7, 247, 227)
     GREEN = (0, 102, 0)
@@ -16,262 +22,636 @@ class SnakeEnvironment:
     RED = (255, 0, 0)
     BLACK = (0, 0, 0)
     GRAY = (120, 120, 120)
+    # the standard board and the canvas it fits, every grid size gets its own dim,
+    # cell_size and start_cell, see __init__
     DIM = (501, 501)
-
-    def __init__(self) -> None:
-        self.canvas = pygame.Surface(self.DIM)
-        self._snake = SnakeHead(self.GREEN)
-        self._food = Food(self.LIGHTBLUE)
-        self.all_sprites = pygame.sprite.Group()
-        self.all_sprites.add(self._food, self._snake)
-        self.previous_head_location = (self._snake.rect.x, self._snake.rect.y)
-        self.lost = None
-        self.score = None
+    GRID_SIZE = (20, 20)
+    MIN_GRID_SIZE = 2
+    MAX_GRID_SIZE = 1000
+    # boards up to this many cells keep their per cell tables in lists, which index fastest,
+    # bigger ones use 4 byte typed arrays so a 1000x1000 board stays around 12 MB
+    MAX_LIST_CELLS = 250_000
+    OBSERVATION_SIZE = 12
+    # features: the 12 float32 features, a fresh array every step
+    # pixels:   (dim[1], dim[0], 3) uint8 RGB frame laid out like render_frame
+    # grid:     (3, height, width) float32 body / head / food planes
+    # pixels and grid are preallocated and updated in place, step returns the same array
+    OBSERVATION_MODES = ("features", "pixels", "grid")
+
+    # (dx, dy) per action, accepts both Action members and their int values
+    _DELTAS = {
+        Action.UP: (0, -1), Action.RIGHT: (1, 0), Action.LEFT: (-1, 0), Action.DOWN: (0, 1),
+        0: (0, -1), 1: (1, 0), 2: (-1, 0), 3: (0, 1),
+    }
+
+    def __init__(self, observation_mode: str = "features", seed: int = None, grid_size: tuple = None,
+                 cell_size: int = None) -> None:
+        if observation_mode not in self.OBSERVATION_MODES:
+            raise Exception("Invalid observation mode, must be one of " + ", ".join(self.OBSERVATION_MODES))
+        self.observation_mode = observation_mode
+        self.grid_size = tuple(grid_size or self.GRID_SIZE)
+        if not all(self.MIN_GRID_SIZE <= side <= self.MAX_GRID_SIZE for side in self.grid_size):
+            raise Exception(f"Invalid grid size, sides must be {self.MIN_GRID_SIZE}-{self.MAX_GRID_SIZE} cells")
+        self._width, self._height = self.grid_size
+        self.start_cell = ((self._width - 1) // 2, (self._height - 1) // 2)
+        # cells shrink to fit the board in DIM, 25 px on the standard board, and lose their
+        # grid lines once they are too small to show both
+        self.cell_size = cell_size or max(1, (self.DIM[0] - 1) // max(self.grid_size))
+        self._grid_line = 1 if self.cell_size >= 4 else 0
+        self.dim = (self._width * self.cell_size + self._grid_line, self._height * self.cell_size + self._grid_line)
+        # rng drives sample_action and picks each episode's seed. Food placement has its own
+        # generator, reseeded with episode_seed on every reset, so an episode is reproduced
+        # exactly from its seed and actions whatever else used rng in between.
+        self.rng = random.Random(seed)
+        self.episode_seed = None
+        self._food_rng = random.Random()
+        # body lives in a ring buffer of cell indices (y * width + x), index 0 is the
+        # piece right behind the head. It starts small and doubles as the snake grows.
+        self._cells = self._width * self._height
+        self._capacity = min(self._cells, 1024)
+        self._body = self._int_table([0] * self._capacity)
+        self._body_start = 0
+        # bitboard of the cells holding body pieces, so moving, eating and collision checks
+        # never walk the body. Reversing into the neck can stack pieces on one cell, the
+        # few cells holding more than one keep their count in _stacked.
+        self._occupancy = bytearray((self._cells + 7) >> 3)
+        self._stacked = {}
+        # every cell without head or body in it, kept as a swap-remove array:
+        # _free[:_free_count] are the free cells and _free_index maps a cell to its
+        # slot in _free (-1 when taken), so food placement is one random pick
+        self._free = self._int_table(range(self._cells))
+        self._free_index = self._int_table(range(self._cells))
+        # starting order of the free cells, put back on every reset. _touched holds the
+        # slots swap-removes wrote to this episode, None once there were more than cells.
+        self._all_cells = self._int_table(range(self._cells))
+        self._touched = []
+        self._free_count = self._cells
+        self._head_x, self._head_y = self.start_cell
+        self._free_remove(self._head_y * self._width + self._head_x)
+        self._food_x, self._food_y = 0, 0
+        self._head_dead = False
+        self._hit_cell = None
+        self._hit_tail = False
+        self._observation = np.zeros(self.OBSERVATION_SIZE, dtype=np.float32)
+        self._observation_stale = True
+        # action masks of the current state by lookahead, emptied whenever the state changes
+        self._masks = {}
+        # pixel or grid frame and the cells to repaint in it, None in features mode
+        self._frame = None
+        self._frame_cells = None
+        self._frame_full = True
+        if observation_mode != "features":
+            self._frame_cells = set()
+        # sprite view, only built once render_frame is called
+        self.canvas = None
+        self._background = None
+        # cells to repaint, None until render_dirty_frame is first used
+        self._dirty_cells = None
+        self._full_redraw = False
+        self.all_sprites = None
         self.snakeBody = []
+        # body piece sprites, reused across episodes
+        self._body_pool = None
+        self._snake = None
+        self._food = None
+        self.lost = None
+        self.score = 0
         self.reset()
 
-    @staticmethod
-    def get_canavs_dim():
-        return SnakeEnvironment.DIM
-
+    def get_canavs_dim(self):
+        return self.dim
 
-    @staticmethod
-    def sample_action() -> Action:
-        return random.choice(list(Action))
 
+    """A random move drawn from rng. It is an instance method since environments are seeded,
+    SnakeEnvironment.sample_action() without an environment no longer works."""
+    def sample_action(self) -> Action:
+        return self.rng.choice(list(Action))
 
-    def sample_safe_action(self) -> Action:
-        observation = self._build_observation()
-        available_actions = []
 
-        for i in range(4):
-            if observation[i] == 0:
-                available_actions.append(Action(i))
+    def sample_safe_action(self, lookahead: int = 0) -> Action:
+        available_actions = [action for action, safe in zip(Action, self._action_mask(lookahead)) if safe]
 
         if len(available_actions) > 0:   
-            return random.choice(available_actions)
+            return self.rng.choice(available_actions)
         
-        return SnakeEnvironment.sample_action()
+        return self.sample_action()
+
+
+    """Which of the four moves (indexed like Action) neither leave the board nor run into
+    the body, the inverse of the blocked features. Reversing into the neck is masked too,
+    though the rules allow it.
+
+    With lookahead, moves into a region of fewer than min(lookahead, score + 1) free cells
+    are masked as well, found by a flood fill that stops once it has counted that many.
+    When every safe move leads into such a trap the plain mask is returned."""
+    def action_mask(self, lookahead: int = 0) -> np.ndarray:
+        return np.array(self._action_mask(lookahead), dtype=bool)
+
+
+    @staticmethod
+    def batch_action_masks(envs: list, lookahead: int = 0, out: np.ndarray = None) -> np.ndarray:
+        if out is None:
+            out = np.empty((len(envs), 4), dtype=bool)
+        for i, env in enumerate(envs):
+            out[i] = env._action_mask(lookahead)
+        return out
 
     
-    def reset(self):
+    def reset(self, seed: int = None):
+        """Starts a new episode, from seed when given or else from a seed drawn from rng"""
+        self.episode_seed = seed if seed is not None else self.rng.getrandbits(64)
+        self._food_rng.seed(self.episode_seed)
+        self._clear_board()
+        if self._masks:
+            self._masks = {}
         self.lost = False
         self.score = 0
-        for piece in self.snakeBody:
-            piece.destroy()
-        self.snakeBody = []
-        self._food.rect.x = SnakeEnvironment.random_grid_num()
-        self._food.rect.y = SnakeEnvironment.random_grid_num()
-        self._snake.rect.x = 226
-        self._snake.rect.y = 226
-        self.previous_head_location = (self._snake.rect.x, self._snake.rect.y)
-        self._snake.change_color(self.GREEN)
+        self._body_start = 0
+        self._head_x, self._head_y = self.start_cell
+        self._free_remove(self._head_y * self._width + self._head_x)
+        self._place_food()
+        self._head_dead = False
+        self._hit_cell = None
+        self._hit_tail = False
+        self._observation_stale = True
+        self._full_redraw = True
+        self._frame_full = True
+        if self._body_pool is not None:
+            self.snakeBody = self._body_pool.resize(0)
         return self._build_observation()
 
 
     def render_frame(self):
-        self.canvas.fill((0, 0, 0))
-        self._draw_lines(self.GRAY)
+        if self.canvas is None:
+            self._build_view()
+        self._sync_view()
+        self.canvas.blit(self._background, (0, 0))
         self.all_sprites.draw(self.canvas)
         return self.canvas
 
 
+    """Only repaints the cells that changed since the last call, returns the canvas and
+    the list of rects that were updated so the caller can pass them to display.update"""
+    def render_dirty_frame(self):
+        if self.canvas is None:
+            self._build_view()
+        if self._dirty_cells is None or self._full_redraw:
+            self.canvas.blit(self._background, (0, 0))
+            self._dirty_cells = {self._body_cell(i) for i in range(self.score)}
+            self._mark_dirty(self._dirty_cells)
+            snapshot = self._color_snapshot()
+            for cell in self._dirty_cells:
+                self._paint_cell(cell, snapshot)
+            self._dirty_cells.clear()
+            self._full_redraw = False
+            return self.canvas, [self.canvas.get_rect()]
+        snapshot = self._color_snapshot()
+        rects = [self._paint_cell(cell, snapshot) for cell in self._dirty_cells]
+        self._dirty_cells.clear()
+        return self.canvas, rects
+
+
     def step(self, action : int):
+        if self.lost:
+            return (self._build_observation(), 0, self.lost)
+        if self._dirty_cells is not None:
+            self._mark_dirty(self._dirty_cells)
+        if self._frame_cells is not None:
+            self._mark_dirty(self._frame_cells)
         # Move the snake head
-        self._move_head(action)
+        new_x, new_y = self._move_head(action)
         # Check to see if the snake head is over the food
-        reward = self._check_eat()
-        if reward == 1:
+        reward = self._check_eat(new_x, new_y)
+        grew = reward == 1
+        if grew:
             self.score += 1
-            self.snakeBody.append(SnakeBodyPiece(self.BODY_GREEN))
-            self.all_sprites.add(self.snakeBody[self.score - 1]) 
-            self._food.rect.x = SnakeEnvironment.random_grid_num()
-            self._food.rect.y = SnakeEnvironment.random_grid_num()
         # Check to see if the game has been lost
-        self._check_out_of_bounds()
-        # Dead Snake :(
+        self._check_out_of_bounds(new_x, new_y)
+        self._observation_stale = True
+        if self._masks:
+            self._masks = {}
+        # Dead Snake :( the head stays where it was
         if self.lost:
-            self._undo_direction(action)
-            self._snake.change_color(self.RED)
+            self._head_dead = True
         else:
-            self._move_body() 
-            # Update snakes previous head location
-            self.previous_head_location = (self._snake.rect.x, self._snake.rect.y)
+            self._move_body(new_x, new_y, grew)
+            if grew:
+                self._place_food()
+        if self._dirty_cells is not None:
+            self._mark_dirty(self._dirty_cells)
+        if self._frame_cells is not None:
+            self._mark_dirty(self._frame_cells)
         return (self._build_observation() ,reward, self.lost)       
 
 
     def get_observation(self):
         return self._build_observation()
 
-    @staticmethod
-    def random_grid_num():
-        num = random.randint(0, int(475 / 25))
-        return num * 25 + 1
+    def snapshot(self) -> Snapshot:
+        start, end = self._body_start, self._body_start + self.score
+        body = self._body[start:end]
+        if end > self._capacity:
+            body += self._body[:end - self._capacity]
+        return Snapshot(
+            self._width, self._height,
+            self._head_y * self._width + self._head_x,
+            self._food_y * self._width + self._food_x if self._food_x >= 0 else -1,
+            tuple(body), self.score, self.lost, self._head_dead, self._hit_cell, self._hit_tail,
+        )
+
+
+    """Puts the food on a random empty cell, off the board once the snake fills it"""
+    def _place_food(self):
+        if self._free_count == 0:
+            self._food_x = self._food_y = -1
+            return
+        cell = self._free[self._food_rng.randrange(self._free_count)]
+        self._food_x = cell % self._width
+        self._food_y = cell // self._width
+
+
+    def _free_add(self, cell : int):
+        if self._free_index[cell] < 0:
+            self._free[self._free_count] = cell
+            self._free_index[cell] = self._free_count
+            self._free_count += 1
+
+
+    def _free_remove(self, cell : int):
+        i = self._free_index[cell]
+        if i >= 0:
+            touched = self._touched
+            if touched is not None:
+                touched.append(i)
+                if len(touched) > self._cells:
+                    self._touched = None
+            self._free_count -= 1
+            last = self._free[self._free_count]
+            self._free[i] = last
+            self._free_index[last] = i
+            self._free_index[cell] = -1
+
+
+    """Empties the board and puts the free cells back in order, so where food lands only
+    depends on the episode seed and not on the games played before. Only what the last game
+    changed is undone: the bytes of its body cells, the slots its removes wrote to and the
+    slots past the lowest free count, which the score bounds."""
+    def _clear_board(self):
+        for i in range(self.score):
+            self._occupancy[self._body_cell(i) >> 3] = 0
+        self._stacked.clear()
+        free, free_index = self._free, self._free_index
+        if self._touched is None:
+            free[:] = self._all_cells
+            free_index[:] = self._all_cells
+        else:
+            for slot in self._touched:
+                free[slot] = slot
+                free_index[slot] = slot
+            low = max(0, self._cells - self.score - 1)
+            free[low:] = self._all_cells[low:]
+            free_index[low:] = self._all_cells[low:]
+        self._touched = []
+        self._free_count = self._cells
 
 
     def _draw_lines(self, color: tuple[int, int, int]):
-        for x in range(0, 501, 25):
-            pygame.draw.line(self.canvas, color, (x, 0), (x, 500), 1)
-        for y in range(0, 501, 25):
-            pygame.draw.line(self.canvas, color, (0, y), (500, y), 1) 
-
-
-    def _build_observation(self) -> list:
-        observation = []
-        # going up?
-        # going down?
-        # going left?
-        # going right?
-        # head x coord (0 centered)
-        # head y coord (0 centerde)
-        # food relative x coord
-        # food relative y coord
-        # tail relative x coord
-        # tail relative y coord
-        # snake body center relative x coord
-        # snake body center relative y coord
-        return observation
-
-
-    # def _get_body_center_coords(self):
-    #     if len(self.snakeBody) >= 1:
-    #         center_piece = int(len(self.snakeBody)//2)
-    #         return math.sqrt((self._snake.rect.x - self.snakeBody[center_piece].rect.x)**2 
-    #             + (self._snake.rect.y - self.snakeBody[center_piece].rect.y)**2)/671.752
-    #     return 476/501
-
-
-    # def _get_tail_coords(self):
-    #     if len(self.snakeBody) >= 1:
-    #         return math.sqrt((self._snake.rect.x - self.snakeBody[-1].rect.x)**2 
-    #             + (self._snake.rect.y - self.snakeBody[-1].rect.y)**2)/671.752
-    #     return 476/501
-
-
-    # def _get_food_coords(self):
-    #     return math.sqrt((self._snake.rect.x - self._food.rect.x)**2 + (self._snake.rect.y - self._food.rect.x)**2)/671.752
-
-
-    # def _get_wall_distance(self):
-    #     left = self._snake.rect.x - 1
-    #     right = 501 - self._snake.rect.x - 25
-    #     up = self._snake.rect.y - 1
-    #     down = 501 - self._snake.rect.y - 25
-    #     return min(left,right,up,down)/225
-
-
-    # def _check_food_direction(self, direction : Action) -> int:
-    #     if direction == Action.UP:
-    #         if self._snake.rect.y < self._food.rect.y:
-    #             return 1
-    #     elif direction == Action.DOWN:
-    #         if self._snake.rect.y > self._food.rect.y:
-    #             return 1
-    #     elif direction == Action.RIGHT:
-    #         if self._snake.rect.x > self._food.rect.x:
-    #             return 1
-    #     elif direction == Action.LEFT:
-    #         if self._snake.rect.x < self._food.rect.x:
-    #             return 1
-    #     return 0
-
-
-    # def _check_touch(self, direction : Action) -> int:
-    #     if direction == Action.UP:
-    #         if (self._snake.rect.y == 1 or self._check_head_snake_body_touch(self._snake.rect.x,self._snake.rect.y - 25)):
-    #             return 1
-    #     elif direction == Action.DOWN:
-    #         if (self._snake.rect.y == 476 or self._check_head_snake_body_touch(self._snake.rect.x,self._snake.rect.y + 25)):
-    #             return 1
-    #     elif direction == Action.RIGHT:
-    #         if (self._snake.rect.x == 476 or self._check_head_snake_body_touch(self._snake.rect.x + 25,self._snake.rect.y)):
-    #             return 1
-    #     elif direction == Action.LEFT:
-    #         if (self._snake.rect.x == 1 or self._check_head_snake_body_touch(self._snake.rect.x - 25,self._snake.rect.y)):
-    #             return 1
-    #     return 0
-
-
-    # def _check_head_snake_body_touch(self, x : int ,y : int):
-    #     for body_part in self.snakeBody:
-    #         if (body_part.rect.x == x and body_part.rect.y == y):
-    #             return True
-    #     return False
-
-
-    def _undo_direction(self, direction):
-        if direction == Action.UP:
-            direction = Action.DOWN
-        elif direction == Action.RIGHT:
-            direction = Action.LEFT
-        elif direction == Action.LEFT:
-            direction = Action.RIGHT
+        import pygame
+        if not self._grid_line:
+            return
+        right, bottom = self.dim[0] - 1, self.dim[1] - 1
+        for x in range(0, self.dim[0], self.cell_size):
+            pygame.draw.line(self._background, color, (x, 0), (x, bottom), 1)
+        for y in range(0, self.dim[1], self.cell_size):
+            pygame.draw.line(self._background, color, (0, y), (right, y), 1) 
+
+
+    def _build_observation(self) -> np.ndarray:
+        if self._frame_cells is not None:
+            return self._refresh_frame()
+        self._refresh_observation()
+        return self._observation.copy()
+
+
+    """Rewrites the cached observation when the state changed since it was last built.
+    Every feature comes from the head, food, occupancy grid or a ring buffer lookup,
+    so this never walks the body."""
+    def _refresh_observation(self):
+        if not self._observation_stale:
+            return
+        self._observation_stale = False
+        width, height = self._width, self._height
+        x, y = self._head_x, self._head_y
+        cell = y * width + x
+        occupied = self._occupied
+        half_x, half_y = (width - 1) / 2, (height - 1) / 2
+        span_x, span_y = width - 1, height - 1
+        if self.score:
+            tail = self._body_cell(self.score - 1)
+            center = self._body_cell(self.score // 2)
         else:
-            direction = Action.UP
-        self._move_head(direction)
+            tail = center = cell
+        self._observation[:] = (
+            # blocked going up / right / left / down (indexed like Action)
+            y == 0 or occupied(cell - width),
+            x == width - 1 or occupied(cell + 1),
+            x == 0 or occupied(cell - 1),
+            y == height - 1 or occupied(cell + width),
+            # head coords (0 centered)
+            (x - half_x) / half_x,
+            (y - half_y) / half_y,
+            # food relative coords
+            (self._food_x - x) / span_x,
+            (self._food_y - y) / span_y,
+            # tail relative coords
+            (tail % width - x) / span_x,
+            (tail // width - y) / span_y,
+            # snake body center relative coords
+            (center % width - x) / span_x,
+            (center // width - y) / span_y,
+        )
+
+
+    def _action_mask(self, lookahead : int = 0) -> tuple:
+        mask = self._masks.get(lookahead)
+        if mask is not None:
+            return mask
+        width, height = self._width, self._height
+        x, y = self._head_x, self._head_y
+        cell = y * width + x
+        occupied = self._occupied
+        mask = (
+            y > 0 and not occupied(cell - width),
+            x < width - 1 and not occupied(cell + 1),
+            x > 0 and not occupied(cell - 1),
+            y < height - 1 and not occupied(cell + width),
+        )
+        if lookahead > 0 and any(mask):
+            need = min(lookahead, self.score + 1)
+            roomy = tuple(
+                safe and self._region_size(cell + offset, need) >= need
+                for safe, offset in zip(mask, (-width, 1, -1, width))
+            )
+            if any(roomy):
+                mask = roomy
+        self._masks[lookahead] = mask
+        return mask
+
+
+    """Counts the free cells reachable from start once the head moved there, up to limit.
+    The old head cell turns into body and the tail leaves unless start is the food."""
+    def _region_size(self, start : int, limit : int) -> int:
+        width, cells = self._width, self._cells
+        occupied = self._occupied
+        tail = -1
+        if self.score and start != self._food_y * width + self._food_x:
+            tail = self._body_cell(self.score - 1)
+            if tail in self._stacked:
+                tail = -1
+        seen = {start, self._head_y * width + self._head_x}
+        frontier = [start]
+        count = 1
+        while frontier and count < limit:
+            cell = frontier.pop()
+            x = cell % width
+            for neighbour, inside in (
+                (cell - width, cell >= width), (cell + 1, x < width - 1),
+                (cell - 1, x > 0), (cell + width, cell < cells - width),
+            ):
+                if inside and neighbour not in seen and (neighbour == tail or not occupied(neighbour)):
+                    seen.add(neighbour)
+                    frontier.append(neighbour)
+                    count += 1
+        return count
 
 
-    """Algorithm responsible for moving the snake body following the head"""
-    def _move_body(self):
+    @staticmethod
+    def batch_observations(envs: list, out: np.ndarray = None) -> np.ndarray:
+        if out is None:
+            out = np.empty((len(envs), SnakeEnvironment.OBSERVATION_SIZE), dtype=np.float32)
+        for i, env in enumerate(envs):
+            env._refresh_observation()
+            out[i] = env._observation
+        return out
+
+
+    def _build_view(self):
+        import pygame
+        from snake_sprites import SnakeHead, Food, BodyPiecePool
+        self.canvas = pygame.Surface(self.dim)
+        # the grid never changes, draw it once and blit it
+        self._background = pygame.Surface(self.dim)
+        self._background.fill(self.BLACK)
+        self._draw_lines(self.GRAY)
+        size = self.cell_size - self._grid_line
+        self._snake = SnakeHead(self.GREEN, size)
+        self._food = Food(self.LIGHTBLUE, size)
+        self.all_sprites = pygame.sprite.Group()
+        self.all_sprites.add(self._food, self._snake)
+        self._body_pool = BodyPiecePool(self.all_sprites, self.BODY_GREEN, size)
+
+
+    """Copies the grid state onto the sprites, taking body pieces from the pool as the
+    snake grew"""
+    def _sync_view(self):
+        cell, line = self.cell_size, self._grid_line
+        self._food.rect.x = self._food_x * cell + line
+        self._food.rect.y = self._food_y * cell + line
+        self._snake.rect.x = self._head_x * cell + line
+        self._snake.rect.y = self._head_y * cell + line
+        self._snake.change_color(self.RED if self._head_dead else self.GREEN)
+
+        if len(self.snakeBody) != self.score:
+            self.snakeBody = self._body_pool.resize(self.score)
+
+        for i, piece in enumerate(self.snakeBody):
+            body_cell = self._body_cell(i)
+            piece.rect.x = (body_cell % self._width) * cell + line
+            piece.rect.y = (body_cell // self._width) * cell + line
+            # the piece that was run into has shifted onto the head's cell
+            if i >= 2 and body_cell == self._hit_cell:
+                piece.change_color(self.RED)
+        if self._hit_tail:
+            self.snakeBody[-1].change_color(self.RED)
+
+
+    """Remembers the cells a step can change: head, food and tail"""
+    def _mark_dirty(self, cells : set):
+        width = self._width
+        cells.add(self._head_y * width + self._head_x)
+        if self._food_x >= 0:
+            cells.add(self._food_y * width + self._food_x)
+        if self.score:
+            cells.add(self._body_cell(self.score - 1))
+
+
+    """Color the sprites show in a cell of snapshot, body over head over food. occupied says
+    whether a body piece is on the cell. Only the pieces that shifted onto hit_cell and the
+    tail of a tail hit are red, the piece right behind the head never is."""
+    @staticmethod
+    def cell_color(snapshot : Snapshot, cell : int, occupied : bool) -> tuple[int, int, int]:
+        if occupied:
+            hit = cell == snapshot.hit_cell or (snapshot.hit_tail and cell == snapshot.body[-1])
+            return SnakeEnvironment.RED if hit else SnakeEnvironment.BODY_GREEN
+        if cell == snapshot.head:
+            return SnakeEnvironment.RED if snapshot.head_dead else SnakeEnvironment.GREEN
+        if cell == snapshot.food:
+            return SnakeEnvironment.LIGHTBLUE
+        return SnakeEnvironment.BLACK
+
+
+    """snapshot() for cell_color. The body is only copied once the game is lost, the colors
+    need nothing but its tail and only after a tail hit."""
+    def _color_snapshot(self) -> Snapshot:
+        if self.lost:
+            return self.snapshot()
+        width = self._width
+        return Snapshot(
+            width, self._height, self._head_y * width + self._head_x,
+            self._food_y * width + self._food_x if self._food_x >= 0 else -1,
+            (), self.score, False, False, None, False,
+        )
+
+
+    def _cell_color(self, cell : int, snapshot : Snapshot) -> tuple[int, int, int]:
+        return self.cell_color(snapshot, cell, self._occupied(cell))
+
+
+    def _paint_cell(self, cell : int, snapshot : Snapshot):
+        width, size, line = self._width, self.cell_size, self._grid_line
+        rect = ((cell % width) * size + line, (cell // width) * size + line, size - line, size - line)
+        return self.canvas.fill(self._cell_color(cell, snapshot), rect)
+
+
+    """Brings the pixel or grid frame up to date, repainting only the cells that changed"""
+    def _refresh_frame(self) -> np.ndarray:
+        width, height = self._width, self._height
+        if self._frame_full:
+            self._frame_full = False
+            if self.observation_mode == "pixels":
+                if self._frame is None:
+                    self._frame = np.zeros((self.dim[1], self.dim[0], 3), dtype=np.uint8)
+                self._frame[:] = self.BLACK
+                if self._grid_line:
+                    self._frame[:, ::self.cell_size] = self.GRAY
+                    self._frame[::self.cell_size, :] = self.GRAY
+            else:
+                if self._frame is None:
+                    self._frame = np.zeros((3, height, width), dtype=np.float32)
+                self._frame[:] = 0
+            self._frame_cells.update(self._body_cell(i) for i in range(self.score))
+            self._mark_dirty(self._frame_cells)
+
+        frame = self._frame
+        if self.observation_mode == "pixels":
+            size, line = self.cell_size, self._grid_line
+            snapshot = self._color_snapshot()
+            for cell in self._frame_cells:
+                x, y = (cell % width) * size + line, (cell // width) * size + line
+                frame[y:y + size - line, x:x + size - line] = self._cell_color(cell, snapshot)
+        else:
+            head = self._head_y * width + self._head_x
+            food = self._food_y * width + self._food_x
+            for cell in self._frame_cells:
+                x, y = cell % width, cell // width
+                frame[0, y, x] = self._occupied(cell)
+                frame[1, y, x] = cell == head
+                frame[2, y, x] = cell == food
+        self._frame_cells.clear()
+        return frame
+
+
+    def _body_cell(self, i : int) -> int:
+        return self._body[(self._body_start + i) % self._capacity]
+
+
+    def _int_table(self, values) -> list:
+        return list(values) if self._cells <= self.MAX_LIST_CELLS else array("i", values)
+
+
+    def _occupied(self, cell : int) -> int:
+        return self._occupancy[cell >> 3] >> (cell & 7) & 1
+
+
+    def _occupy(self, cell : int):
+        bit = 1 << (cell & 7)
+        if self._occupancy[cell >> 3] & bit:
+            self._stacked[cell] = self._stacked.get(cell, 1) + 1
+        else:
+            self._occupancy[cell >> 3] |= bit
+
+
+    """Takes one piece off a cell, returns whether the cell is empty now"""
+    def _vacate(self, cell : int) -> bool:
+        count = self._stacked.get(cell)
+        if count is None:
+            self._occupancy[cell >> 3] ^= 1 << (cell & 7)
+            return True
+        if count == 2:
+            del self._stacked[cell]
+        else:
+            self._stacked[cell] = count - 1
+        return False
+
+
+    """Shifts the body one cell towards the new head position in O(1)"""
+    def _move_body(self, new_x : int, new_y : int, grew : bool):
+        new_cell = new_y * self._width + new_x
+        length = self.score - 1 if grew else self.score
+
+        # running into any piece but the first one (the old tail included) kills the snake
+        if length > 1:
+            hits = self._stacked.get(new_cell) or self._occupancy[new_cell >> 3] >> (new_cell & 7) & 1
+            if hits and self._body[self._body_start] == new_cell:
+                hits -= 1
+            if hits:
+                self.lost = True
+                self._hit_tail = not grew and self._body_cell(length - 1) == new_cell
+                # the pieces run into shift one further down the body, so they show up red
+                # on this cell unless the only one was the tail, which leaves it
+                if hits > self._hit_tail:
+                    self._hit_cell = new_cell
+
+        prev_cell = self._head_y * self._width + self._head_x
         if self.score >= 1:
-            temp_x = self.snakeBody[0].rect.x
-            temp_y = self.snakeBody[0].rect.y
+            if self.score > self._capacity:
+                self._grow_body()
+            if not grew:
+                tail = self._body_cell(length - 1)
+                # after a reversal into the neck the tail can be where the head was,
+                # which is taken again right below
+                if self._vacate(tail) and tail != prev_cell:
+                    self._free_add(tail)
+            self._body_start = (self._body_start - 1) % self._capacity
+            self._body[self._body_start] = prev_cell
+            self._occupy(prev_cell)
+        else:
+            self._free_add(prev_cell)
 
-            self.snakeBody[0].rect.x = self.previous_head_location[0]
-            self.snakeBody[0].rect.y = self.previous_head_location[1]
+        self._head_x, self._head_y = new_x, new_y
+        self._free_remove(new_cell)
 
-            if self.score == 1:
-                self.snakeBody[0].last_x = self._snake.rect.x
-                self.snakeBody[0].last_y = self._snake.rect.y
-            else:
-                self.snakeBody[0].last_x = temp_x
-                self.snakeBody[0].last_y = temp_y
-
-        if self.score > 1:
-            for i in range(1, len(self.snakeBody)):
-                # check lost
-                if ((self.snakeBody[i].rect.y == self._snake.rect.y) and
-                        (self.snakeBody[i].rect.x == self._snake.rect.x)):
-                    self.lost = True
-                    if i + 1 >= len(self.snakeBody):
-                        self.snakeBody[i].change_color(self.RED)
-                    else:
-                        self.snakeBody[i + 1].change_color(self.RED)
-
-                # store current body part's location
-                temp_x = self.snakeBody[i].rect.x
-                temp_y = self.snakeBody[i].rect.y
-
-                # set current body part to location of prev body part
-                self.snakeBody[i].rect.x = self.snakeBody[i - 1].last_x
-                self.snakeBody[i].rect.y = self.snakeBody[i - 1].last_y
-
-                # set current body part prev location to old loc (temp)
-                self.snakeBody[i].last_x = temp_x
-                self.snakeBody[i].last_y = temp_y
-
-
-    def _check_out_of_bounds(self):
-        if (0 > self._snake.rect.x or 500 < self._snake.rect.x
-                or 0 > self._snake.rect.y or 500 < self._snake.rect.y):
+
+    def _grow_body(self):
+        body = [self._body_cell(i) for i in range(self.score - 1)]
+        self._capacity *= 2
+        self._body = self._int_table(body + [0] * (self._capacity - len(body)))
+        self._body_start = 0
+
+
+    def _check_out_of_bounds(self, x : int, y : int):
+        if not (0 <= x < self._width and 0 <= y < self._height):
             self.lost = True
 
 
-    def _check_eat(self):
-        if ((self._snake.rect.y == self._food.rect.y) and
-                (self._snake.rect.x == self._food.rect.x)):
+    def _check_eat(self, x : int, y : int):
+        if y == self._food_y and x == self._food_x:
             return 1
         return 0
 
 
     def _move_head(self, direction):
-        if direction == Action.UP:  
-            self._snake.rect.y -= 25
-        elif direction == Action.DOWN:  
-            self._snake.rect.y += 25
-        elif direction == Action.RIGHT:  
-            self._snake.rect.x += 25
-        elif direction == Action.LEFT:  
-            self._snake.rect.x -= 25
-        else:
-            raise Exception("Invalid direction, must be an int 0-3") 
\ No newline at end of file
+        delta = self._DELTAS.get(direction)
+        if delta is None:
+            raise Exception("Invalid direction, must be an int 0-3")
+        return self._head_x + delta[0], self._head_y + delta[1]
@@ -1,36 +1,71 @@
 import pygame
 
+# one pre-filled Surface per (color, size), shared by every sprite showing that color, so
+# recoloring a sprite swaps its image instead of filling a Surface of its own
+_filled_images = {}
+
+
+def filled_image(color: tuple[int, int, int], size: int) -> pygame.Surface:
+    key = (tuple(color), size)
+    image = _filled_images.get(key)
+    if image is None:
+        image = pygame.Surface([size, size])
+        image.fill(color)
+        _filled_images[key] = image
+    return image
+
+
 class SnakeHead(pygame.sprite.Sprite):
-    def __init__(self, color: tuple[int, int, int]):
+    def __init__(self, color: tuple[int, int, int], size: int = 24):
         pygame.sprite.Sprite.__init__(self)
-        self.image = pygame.Surface([24, 24])
-        self.image.fill(color)
+        self.size = size
+        self.image = filled_image(color, size)
         self.rect = self.image.get_rect()
 
     def change_color(self, color: tuple[int, int, int]):
-        self.image.fill(color)
+        self.image = filled_image(color, self.size)
 
 
 class SnakeBodyPiece(pygame.sprite.Sprite):
-    def __init__(self, color: tuple[int, int, int]):
+    def __init__(self, color: tuple[int, int, int], size: int = 24):
         pygame.sprite.Sprite.__init__(self)
-        self.image = pygame.Surface([24, 24])
-        self.image.fill(color)
+        self.size = size
+        self.image = filled_image(color, size)
         self.rect = self.image.get_rect()
-        self.last_x = 0
-        self.last_y = 0
 
     def change_color(self, color: tuple[int, int, int]):
-        self.image.fill(color)
+        self.image = filled_image(color, self.size)
+
+
+class BodyPiecePool:
+    """Body pieces kept for the whole session, as many as the longest snake so far needed.
+    resize shows the first count of them in the group and hides the rest, pieces shown
+    again are given back their starting color."""
+
+    def __init__(self, group: pygame.sprite.Group, color: tuple[int, int, int], size: int = 24):
+        self.group = group
+        self.color = color
+        self.size = size
+        self.pieces = []
+        self.visible = 0
 
-    def destroy(self):
-        # Remove the sprite from all groups
-        self.kill()
+    def resize(self, count: int) -> list:
+        """Returns the visible pieces, head end first"""
+        while len(self.pieces) < count:
+            self.pieces.append(SnakeBodyPiece(self.color, self.size))
+        if count < self.visible:
+            self.group.remove(self.pieces[count:self.visible])
+        elif count > self.visible:
+            shown = self.pieces[self.visible:count]
+            for piece in shown:
+                piece.change_color(self.color)
+            self.group.add(shown)
+        self.visible = count
+        return self.pieces[:count]
 
 
 class Food(pygame.sprite.Sprite):
-    def __init__(self, color: tuple[int, int, int]):
+    def __init__(self, color: tuple[int, int, int], size: int = 24):
         pygame.sprite.Sprite.__init__(self)
-        self.image = pygame.Surface([24, 24])
-        self.image.fill(color)
+        self.image = filled_image(color, size)
         self.rect = self.image.get_rect()
@@ -0,0 +1,24 @@
+import pygame
+import pytest
+
+import hot_paths
+
+
+@pytest.fixture(autouse=True)
+def quick(monkeypatch):
+    """One call per benchmark, the timings don't matter here"""
+    measure = hot_paths.measure
+    monkeypatch.setattr(hot_paths, "measure", lambda func, number, repeat=1: measure(func, 1, 1))
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+@pytest.mark.parametrize("group", list(hot_paths.BENCHMARKS))
+def test_benchmark_group_runs(group):
+    hot_paths.seed_everything()
+    results = {}
+    hot_paths.BENCHMARKS[group](results)
+    assert results
+    for result in results.values():
+        assert result["best_us"] > 0
@@ -0,0 +1,105 @@
+import struct
+
+import numpy as np
+import pygame
+import pytest
+
+from episode_export import EpisodeRenderer, export_episode
+from recording import EpisodeReader, EpisodeWriter
+from snake import SnakeEnvironment
+from test_rendering import frame_of, stacked_tail_hit
+
+
+@pytest.fixture(autouse=True)
+def display():
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+def lzw_decode(data: bytes, min_size: int) -> bytes:
+    clear, end = 1 << min_size, (1 << min_size) + 1
+    bits = int.from_bytes(data, "little")
+    position, total = 0, len(data) * 8
+    table = [bytes((i,)) for i in range(clear)] + [b"", b""]
+    size, previous, out = min_size + 1, None, bytearray()
+    while position + size <= total:
+        code = bits >> position & ((1 << size) - 1)
+        position += size
+        if code == clear:
+            table = table[:clear + 2]
+            size, previous = min_size + 1, None
+            continue
+        if code == end:
+            break
+        if code < len(table):
+            entry = table[code]
+            if previous is not None:
+                table.append(previous + entry[:1])
+        else:
+            entry = previous + previous[:1]
+            table.append(entry)
+        out += entry
+        previous = entry
+        if len(table) == 1 << size and size < 12:
+            size += 1
+    return bytes(out)
+
+
+def decode_gif(path: str) -> list:
+    """Every frame of a GIF with a global palette as a (height, width, 3) array"""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:6] == b"GIF89a"
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    palette = np.frombuffer(data, dtype=np.uint8, count=3 << ((flags & 7) + 1), offset=13).reshape(-1, 3)
+    position = 13 + palette.nbytes
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    transparent, frames = None, []
+
+    def sub_blocks():
+        nonlocal position
+        chunks = []
+        while data[position]:
+            chunks.append(data[position + 1:position + 1 + data[position]])
+            position += 1 + data[position]
+        position += 1
+        return b"".join(chunks)
+
+    while data[position] != 0x3B:
+        if data[position] == 0x21:
+            label = data[position + 1]
+            position += 2
+            block = sub_blocks()
+            if label == 0xF9:
+                transparent = block[3] if block[0] & 1 else None
+        else:
+            left, top, w, h, _ = struct.unpack_from("<HHHHB", data, position + 1)
+            min_size = data[position + 10]
+            position += 11
+            indices = np.frombuffer(lzw_decode(sub_blocks(), min_size), dtype=np.uint8)[:w * h].reshape(h, w)
+            region = canvas[top:top + h, left:left + w]
+            shown = indices != transparent if transparent is not None else np.ones_like(indices, dtype=bool)
+            region[shown] = palette[indices[shown]]
+            frames.append(canvas.copy())
+    return frames
+
+
+def test_gif_frames_match_render_frame(tmp_path):
+    # an episode that ends on a tail hit with the tail stacked on the neck
+    env = SnakeEnvironment(grid_size=(7, 5), cell_size=6)
+    actions = stacked_tail_hit(env, seed=0)
+    recording = str(tmp_path / "episodes.rec")
+    with EpisodeWriter(recording, env.grid_size) as writer:
+        writer.record(env, actions)
+
+    renderer = EpisodeRenderer(EpisodeReader(recording), cell_size=6)
+    frames = decode_gif(export_episode(renderer, 0, str(tmp_path / "episode")))
+    assert len(frames) == len(actions) + 1
+
+    env.reset(seed=env.episode_seed)
+    assert np.array_equal(frames[0], frame_of(env.render_frame()))
+    for frame, action in zip(frames[1:], actions):
+        env.step(action)
+        assert np.array_equal(frame, frame_of(env.render_frame()))
+    assert env.lost and env.snapshot().hit_tail
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from expert_data import ExpertDataWriter, load_chunks, play_pairs
+from planners import AStarAgent, HamiltonianAgent, hamiltonian_cycle
+from snake import SnakeEnvironment
+
+
+@pytest.mark.parametrize("grid_size", [(2, 2), (6, 4), (5, 6), (6, 5), (7, 4)])
+def test_cycle_visits_every_cell_once(grid_size):
+    width, height = grid_size
+    cycle = hamiltonian_cycle(width, height)
+    assert sorted(cycle) == list(range(width * height))
+    for cell, following in zip(cycle, cycle[1:] + cycle[:1]):
+        x, y, next_x, next_y = cell % width, cell // width, following % width, following // width
+        assert abs(x - next_x) + abs(y - next_y) == 1
+
+
+def test_odd_board_has_no_cycle():
+    with pytest.raises(Exception):
+        hamiltonian_cycle(5, 5)
+
+
+@pytest.mark.parametrize("agent", [AStarAgent, HamiltonianAgent])
+@pytest.mark.parametrize("grid_size", [(6, 6), (7, 4), (5, 6)])
+def test_agent_fills_the_board(agent, grid_size):
+    env = SnakeEnvironment(seed=4, grid_size=grid_size)
+    cells = grid_size[0] * grid_size[1]
+    for seed in range(3):
+        env.reset(seed=seed)
+        player = agent(env)
+        # the cycle alone fills the board in under cells moves per food
+        for _ in range(cells * cells):
+            if env.score == cells - 1:
+                break
+            _, _, lost = env.step(player.act())
+            assert not lost
+        assert env.score == cells - 1
+
+
+def test_expert_chunks_round_trip(tmp_path):
+    observations, actions, _ = play_pairs("astar", 250, seed=1, grid_size=(6, 6))
+    with ExpertDataWriter(str(tmp_path), chunk_size=100) as writer:
+        writer.add(observations, actions)
+    chunks = list(load_chunks(str(tmp_path)))
+    assert [len(chunk_actions) for _, chunk_actions in chunks] == [100, 100, 50]
+    np.testing.assert_array_equal(np.concatenate([o for o, _ in chunks]), observations)
+    np.testing.assert_array_equal(np.concatenate([a for _, a in chunks]), actions)
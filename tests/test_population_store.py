@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+
+from network import SequentialNetwork
+from numpy_network import NumpyNetwork, genome_size
+from population_store import PopulationStore, state_dict_to_genome
+
+ARCHITECTURE = [12, 8, 4]
+
+
+def population(rng, count: int) -> np.ndarray:
+    return rng.standard_normal((count, genome_size(ARCHITECTURE))).astype(np.float32)
+
+
+def test_append_and_reopen(tmp_path):
+    path = str(tmp_path / "population.bin")
+    rng = np.random.default_rng(0)
+    first, second = population(rng, 5), population(rng, 3)
+    store = PopulationStore(path, ARCHITECTURE)
+    assert store.append(first, fitness=[1, 5, 2, np.nan, 0]) == 0
+    assert store.append(second, fitness=[3, 9, 4]) == 1
+
+    store = PopulationStore(path)
+    assert store.architecture == ARCHITECTURE
+    assert len(store) == 8 and store.generations == [0, 1]
+    np.testing.assert_array_equal(store.genomes(), np.concatenate([first, second]))
+    genomes, fitness = store.generation(0)
+    np.testing.assert_array_equal(genomes, first)
+    assert np.isnan(fitness[3])
+    np.testing.assert_array_equal(store.best(0), first[1])
+    np.testing.assert_array_equal(store.best(), second[1])
+    with pytest.raises(Exception):
+        store.generation(2)
+    with pytest.raises(Exception):
+        PopulationStore(path, [12, 4])
+
+
+def test_state_dict_matches_the_genome(tmp_path):
+    rng = np.random.default_rng(1)
+    genomes = population(rng, 2)
+    store = PopulationStore(str(tmp_path / "population.bin"), ARCHITECTURE)
+    store.append(genomes)
+
+    state_dict = store.state_dict(1)
+    np.testing.assert_array_equal(state_dict_to_genome(state_dict), genomes[1])
+    model = SequentialNetwork(ARCHITECTURE)
+    model.load_state_dict(state_dict)
+    observations = rng.standard_normal((6, 12)).astype(np.float32)
+    np.testing.assert_allclose(
+        model.predict(observations).numpy(), NumpyNetwork(ARCHITECTURE, genomes[1]).forward(observations), rtol=1e-5, atol=1e-6
+    )
+    # the tensors are views of the mapped file, not copies
+    assert np.shares_memory(state_dict["layers.0.weight"].numpy(), store.genomes())
+    assert isinstance(state_dict["layers.1.bias"], torch.Tensor)
@@ -0,0 +1,91 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from recording import MAGIC, EpisodeReader, EpisodeWriter, pack_actions, unpack_actions
+from snake import SnakeEnvironment
+
+
+def play(env: SnakeEnvironment, seed: int, max_steps: int = 400) -> tuple:
+    """Plays one episode, returns its actions, what every step returned and the snapshot after it"""
+    env.reset(seed=seed)
+    actions, results, snapshots = [], [], []
+    while not env.lost and len(actions) < max_steps:
+        action = env.sample_safe_action().value
+        observation, reward, done = env.step(action)
+        actions.append(action)
+        results.append((observation, reward, done))
+        snapshots.append(env.snapshot())
+    return actions, results, snapshots
+
+
+def record(path: str, grid_size: tuple, seeds) -> list:
+    env = SnakeEnvironment(seed=0, grid_size=grid_size)
+    episodes = []
+    with EpisodeWriter(path, grid_size) as writer:
+        for seed in seeds:
+            episode = play(env, seed)
+            writer.record(env, episode[0])
+            episodes.append(episode)
+    return episodes
+
+
+def test_pack_round_trip():
+    actions = np.random.default_rng(0).integers(4, size=1001).astype(np.uint8)
+    packed = pack_actions(actions)
+    assert len(packed) == 251
+    np.testing.assert_array_equal(unpack_actions(packed, len(actions)), actions)
+
+
+@pytest.mark.parametrize("grid_size", [None, (9, 6)])
+def test_replay_and_seek(tmp_path, grid_size):
+    path = str(tmp_path / "episodes.rec")
+    episodes = record(path, grid_size, range(5))
+    reader = EpisodeReader(path)
+    assert reader.grid_size == (grid_size or SnakeEnvironment.GRID_SIZE)
+    assert len(reader) == len(episodes)
+    for i, (actions, results, snapshots) in enumerate(episodes):
+        _, steps, score = reader.header(i)
+        assert steps == len(actions) and score == snapshots[-1].score
+        np.testing.assert_array_equal(reader.actions(i), actions)
+        np.testing.assert_array_equal(reader.actions(i, 3, 11), actions[3:11])
+        for (observation, reward, done), expected in zip(reader.replay(i), results):
+            np.testing.assert_array_equal(observation, expected[0])
+            assert (reward, done) == expected[1:]
+        for step in (1, len(actions) // 2, len(actions)):
+            env = reader.seek(i, step)
+            assert env.grid_size == reader.grid_size
+            assert env.snapshot() == snapshots[step - 1]
+
+
+def test_reader_rebuilds_a_missing_index(tmp_path):
+    path = str(tmp_path / "episodes.rec")
+    episodes = record(path, (8, 8), range(3))
+    os.remove(path + ".idx")
+    reader = EpisodeReader(path)
+    assert len(reader) == 3
+    assert reader.seek(2, len(episodes[2][0])).snapshot() == episodes[2][2][-1]
+
+
+def test_board_size_is_checked(tmp_path):
+    path = str(tmp_path / "episodes.rec")
+    record(path, (9, 6), range(1))
+    with pytest.raises(Exception):
+        EpisodeWriter(path, (20, 20))
+    with EpisodeWriter(path) as writer:
+        assert writer.grid_size == (9, 6)
+        with pytest.raises(Exception):
+            writer.record(SnakeEnvironment(), [])
+    reader = EpisodeReader(path)
+    with pytest.raises(Exception):
+        reader.seek(0, 1, SnakeEnvironment())
+
+
+def test_version_1_recordings_are_rejected(tmp_path):
+    path = str(tmp_path / "old.rec")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<8sI", MAGIC, 1) + bytes(16))
+    with pytest.raises(Exception):
+        EpisodeReader(path)
@@ -0,0 +1,87 @@
+import numpy as np
+import pygame
+import pytest
+
+from live_view import LiveView
+from snake import SnakeEnvironment
+
+# the opposite of every move, indexed like Action
+REVERSE = (3, 2, 1, 0)
+
+
+@pytest.fixture(autouse=True)
+def display():
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+def frame_of(canvas) -> np.ndarray:
+    return pygame.surfarray.array3d(canvas).transpose(1, 0, 2)
+
+
+def toward_food(env: SnakeEnvironment) -> int:
+    """The safe move that brings the head closest to the food"""
+    snapshot = env.snapshot()
+    width = snapshot.width
+    head_x, head_y = snapshot.head % width, snapshot.head // width
+    food_x, food_y = snapshot.food % width, snapshot.food // width
+    moves = [action for action, safe in enumerate(env.action_mask()) if safe]
+    deltas = ((0, -1), (1, 0), (-1, 0), (0, 1))
+    return min(moves, key=lambda action: abs(head_x + deltas[action][0] - food_x) + abs(head_y + deltas[action][1] - food_y))
+
+
+def stacked_tail_hit(env: SnakeEnvironment, seed: int) -> list:
+    """Grows the snake to three pieces, then turns back into the neck twice so the tail ends
+    up on the neck cell and runs into it. Returns the moves made."""
+    env.reset(seed=seed)
+    actions = []
+    while env.score < 3:
+        actions.append(toward_food(env))
+        env.step(actions[-1])
+    action = actions[-1]
+    for action in (REVERSE[action], action, REVERSE[action]):
+        actions.append(action)
+        env.step(action)
+    return actions
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stacked_tail_hit_leaves_the_neck_green(seed):
+    env = SnakeEnvironment("pixels", grid_size=(7, 5))
+    stacked_tail_hit(env, seed)
+    snapshot = env.snapshot()
+    assert snapshot.lost and snapshot.hit_tail and snapshot.hit_cell is None
+
+    neck = snapshot.body[1]
+    size, line = env.cell_size, env._grid_line
+    x, y = (neck % snapshot.width) * size + line, (neck // snapshot.width) * size + line
+    observation = env.get_observation()
+    assert tuple(observation[y, x]) == SnakeEnvironment.BODY_GREEN
+    assert np.array_equal(observation, frame_of(env.render_frame()))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_live_view_draws_like_render_frame(seed):
+    env = SnakeEnvironment(grid_size=(7, 5))
+    stacked_tail_hit(env, seed)
+    surface = pygame.Surface(env.dim)
+    LiveView.draw_snapshot(surface, LiveView._background(env), env.snapshot(), env)
+    assert np.array_equal(frame_of(surface), frame_of(env.render_frame()))
+
+
+def test_pixels_match_render_frame():
+    pixels = SnakeEnvironment("pixels", seed=1, grid_size=(7, 5))
+    sprites = SnakeEnvironment(seed=1, grid_size=(7, 5))
+    for episode in range(8):
+        observation = pixels.reset(seed=episode)
+        sprites.reset(seed=episode)
+        assert np.array_equal(observation, frame_of(sprites.render_frame()))
+        while not sprites.lost:
+            # turn back into the neck now and then, which stacks body pieces
+            action = sprites.rng.randrange(4) if sprites.rng.random() < 0.3 else sprites.sample_safe_action().value
+            observation, _, _ = pixels.step(action)
+            sprites.step(action)
+            assert np.array_equal(observation, frame_of(sprites.render_frame()))
+            canvas, _ = pixels.render_dirty_frame()
+            assert np.array_equal(frame_of(canvas), observation)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer, SumTree
+
+
+def reference_find(priorities: np.ndarray, values) -> np.ndarray:
+    return np.searchsorted(np.cumsum(priorities), values, side="right")
+
+
+def test_sum_tree_total_and_find():
+    priorities = np.array([3, 0, 1, 4, 0, 2], dtype=np.float64)
+    tree = SumTree(len(priorities))
+    tree.update(np.arange(len(priorities)), priorities)
+    assert tree.total == priorities.sum()
+    np.testing.assert_array_equal(tree[np.arange(6)], priorities)
+    # both ends of every leaf's slice, zero priority leaves are never found
+    values = [0, 2.5, 2.999, 3, 3.5, 4, 7.999, 8, 9.999]
+    np.testing.assert_array_equal(tree.find(values), [0, 0, 0, 2, 2, 3, 3, 5, 5])
+    np.testing.assert_array_equal(tree.find(values), reference_find(priorities, values))
+
+
+def test_sum_tree_updates_match_reference():
+    rng = np.random.default_rng(0)
+    capacity = 37
+    priorities = np.zeros(capacity)
+    tree = SumTree(capacity)
+    for _ in range(50):
+        indices = rng.integers(capacity, size=8)
+        new = rng.integers(0, 10, size=8).astype(np.float64)
+        tree.update(indices, new)
+        # repeated indices keep the last priority
+        priorities[indices] = new
+        assert tree.total == priorities.sum()
+        if tree.total:
+            values = rng.random(64) * tree.total
+            np.testing.assert_array_equal(tree.find(values), reference_find(priorities, values))
+
+
+def test_prioritized_sampling_follows_priorities():
+    buffer = PrioritizedReplayBuffer(4, observation_shape=(1,), seed=1, alpha=1, epsilon=0)
+    buffer.add(np.zeros((4, 1)), [0, 1, 2, 3], np.zeros(4), np.zeros((4, 1)), np.zeros(4))
+    buffer.update_priorities(np.arange(4), np.array([1, 2, 3, 4], dtype=np.float64))
+    counts = np.zeros(4)
+    for _ in range(500):
+        batch = buffer.sample(20)
+        counts += np.bincount(batch.indices, minlength=4)
+        np.testing.assert_array_equal(buffer.actions[batch.indices], batch.actions)
+    np.testing.assert_allclose(counts / counts.sum(), [0.1, 0.2, 0.3, 0.4], atol=0.01)
+
+
+def test_ring_overwrites_the_oldest():
+    buffer = ReplayBuffer(3, observation_shape=(1,), seed=0)
+    buffer.add(np.zeros((5, 1)), np.arange(5), np.arange(5), np.zeros((5, 1)), np.zeros(5))
+    assert len(buffer) == 3
+    assert sorted(buffer.actions.tolist()) == [2, 3, 4]
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from snake import Action, SnakeEnvironment
+
+DELTAS = ((0, -1), (1, 0), (-1, 0), (0, 1))
+
+
+class BaselineSnake:
+    """The rules of the original sprite based SnakeEnvironment, in cells: food is eaten before
+    the bounds check, a head that left the board stays where it was, and the body shifts even
+    on the step that kills the snake. Running into a piece other than the first, compared
+    before the body moved (the tail included), is a loss."""
+
+    def __init__(self, width: int, height: int, start: tuple, food: tuple):
+        self.width, self.height = width, height
+        self.head = start
+        self.body = []
+        self.food = food
+        self.score = 0
+        self.lost = False
+
+    def step(self, action: int) -> tuple:
+        dx, dy = DELTAS[action]
+        new = (self.head[0] + dx, self.head[1] + dy)
+        reward = int(new == self.food)
+        self.score += reward
+        if not (0 <= new[0] < self.width and 0 <= new[1] < self.height):
+            self.lost = True
+            return reward, self.lost
+        old = self.body + [None] * reward
+        if any(piece == new for piece in old[1:]):
+            self.lost = True
+        self.body = ([self.head] + old[:-1]) if old else []
+        self.head = new
+        return reward, self.lost
+
+
+def cells(snapshot) -> tuple:
+    width = snapshot.width
+    return tuple((cell % width, cell // width) for cell in snapshot.body)
+
+
+@pytest.mark.parametrize("grid_size", [(5, 4), (20, 20)])
+def test_matches_baseline_rules(grid_size):
+    env = SnakeEnvironment(seed=11, grid_size=grid_size)
+    rng = random.Random(2)
+    for episode in range(40):
+        env.reset(seed=episode)
+        snapshot = env.snapshot()
+        width = snapshot.width
+        reference = BaselineSnake(*grid_size, env.start_cell, (snapshot.food % width, snapshot.food // width))
+        while not env.lost:
+            # safe moves mostly, turning back into the neck and running into walls or the body now and then
+            action = rng.randrange(4) if rng.random() < 0.2 else env.sample_safe_action().value
+            _, reward, done = env.step(action)
+            assert (reward, done) == reference.step(action)
+            snapshot = env.snapshot()
+            assert (snapshot.head % width, snapshot.head // width) == reference.head
+            assert cells(snapshot) == tuple(reference.body)
+            assert snapshot.score == reference.score
+            # food placement is the env's own, it only has to land on a free cell
+            reference.food = (snapshot.food % width, snapshot.food // width)
+            if snapshot.food >= 0 and not done:
+                assert reference.food != reference.head and reference.food not in reference.body
+
+
+def test_same_seed_same_episode():
+    first, second = SnakeEnvironment(seed=1), SnakeEnvironment(seed=2)
+    first.reset(seed=7)
+    second.reset(seed=7)
+    for _ in range(300):
+        action = first.sample_safe_action()
+        assert first.step(action)[1:] == second.step(action)[1:]
+        assert first.snapshot() == second.snapshot()
+        if first.lost:
+            break
+
+
+def test_invalid_direction():
+    env = SnakeEnvironment()
+    with pytest.raises(Exception):
+        env.step(4)
+    env.step(Action.UP)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from snake import SnakeEnvironment
+from vec_snake import VecSnakeEnvironment
+
+LOOKAHEADS = (0, 3, 12)
+
+
+def follow_food(env: SnakeEnvironment, food_x: int, food_y: int):
+    """Puts a scalar game's food where the batched one put it, the two draw food from their
+    own generators"""
+    env._food_x, env._food_y = int(food_x), int(food_y)
+    env._observation_stale = True
+    env._masks = {}
+
+
+def assert_same_state(vec: VecSnakeEnvironment, envs: list, observations: np.ndarray):
+    np.testing.assert_array_equal(observations, SnakeEnvironment.batch_observations(envs))
+    for lookahead in LOOKAHEADS:
+        np.testing.assert_array_equal(
+            vec.action_masks(lookahead), SnakeEnvironment.batch_action_masks(envs, lookahead), err_msg=f"lookahead {lookahead}"
+        )
+
+
+def assert_free_cells(vec: VecSnakeEnvironment, envs: list):
+    """Every game's free list holds exactly the cells its scalar twin has no head or body in"""
+    for i, env in enumerate(envs):
+        snapshot = env.snapshot()
+        taken = sorted(set(snapshot.body) | {snapshot.head})
+        count = vec._free_count[i]
+        free = vec._free[i, :count]
+        np.testing.assert_array_equal(np.sort(free), np.setdiff1d(np.arange(len(vec._free_index[i])), taken))
+        np.testing.assert_array_equal(vec._free_index[i, free], np.arange(count))
+        assert (vec._free_index[i, taken] == -1).all()
+
+
+def assert_boards_cleared(vec: VecSnakeEnvironment, grid_size: tuple):
+    """After a reset every game's free list is back in its starting order"""
+    fresh = VecSnakeEnvironment(vec.num_envs, grid_size=grid_size)
+    np.testing.assert_array_equal(vec._free, fresh._free)
+    np.testing.assert_array_equal(vec._free_index, fresh._free_index)
+    np.testing.assert_array_equal(vec._free_count, fresh._free_count)
+    assert not vec._occupancy.any() and not vec._stacked
+
+
+@pytest.mark.parametrize("body_capacity", [VecSnakeEnvironment.BODY_CAPACITY, 4])
+@pytest.mark.parametrize("grid_size", [(7, 5), (20, 20)])
+def test_vec_matches_scalar(grid_size, body_capacity, monkeypatch):
+    # a tiny ring makes the bodies grow and most resets copy the whole free list back
+    monkeypatch.setattr(VecSnakeEnvironment, "BODY_CAPACITY", body_capacity)
+    num_envs = 8
+    vec = VecSnakeEnvironment(num_envs, seed=3, grid_size=grid_size)
+    envs = [SnakeEnvironment(grid_size=grid_size) for _ in range(num_envs)]
+    for i, env in enumerate(envs):
+        follow_food(env, vec.food_x[i], vec.food_y[i])
+    observations = vec.reset()
+    for i, env in enumerate(envs):
+        follow_food(env, vec.food_x[i], vec.food_y[i])
+    assert_same_state(vec, envs, observations)
+
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(400):
+        # mostly safe moves so games get long, with some into walls, the body and the neck
+        safe = vec.action_masks(0)
+        actions = np.array([
+            rng.choice(np.flatnonzero(row)) if row.any() and rng.random() < 0.9 else rng.integers(4)
+            for row in safe
+        ])
+        observations, rewards, dones = vec.step(actions)
+        for i, env in enumerate(envs):
+            _, reward, done = env.step(int(actions[i]))
+            assert (reward, done) == (rewards[i], dones[i])
+            if done:
+                assert env.score == vec.final_scores[i]
+                env.reset()
+                finished += 1
+            if done or reward:
+                follow_food(env, vec.food_x[i], vec.food_y[i])
+            assert env.score == vec.scores[i]
+        assert_same_state(vec, envs, observations)
+        assert_free_cells(vec, envs)
+    assert finished
+    vec.reset()
+    assert_boards_cleared(vec, grid_size)
+
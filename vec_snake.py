@@ -0,0 +1,397 @@
+import numpy as np
+from snake import SnakeEnvironment
+
+
+def _ranges(starts, lengths) -> np.ndarray:
+    """starts[i], starts[i] + 1, ..., starts[i] + lengths[i] - 1 for every i, flattened"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+
+
+class VecSnakeEnvironment:
+    """Runs num_envs snake games in lock step, the whole batch lives in NumPy arrays"""
+
+    # (dx, dy) indexed by Action value
+    DX = np.array([0, 1, -1, 0], dtype=np.int32)
+    DY = np.array([-1, 0, 0, 1], dtype=np.int32)
+
+    # features: (N, 12) float32, a fresh array every step
+    # grid:     (N, 3, height, width) float32 body / head / food planes, updated in place
+    OBSERVATION_MODES = ("features", "grid")
+    # cells each body ring starts with, they double as the longest snake grows
+    BODY_CAPACITY = 1024
+
+    def __init__(self, num_envs: int, seed: int = None, observation_mode: str = "features",
+                 grid_size: tuple = None) -> None:
+        if observation_mode not in self.OBSERVATION_MODES:
+            raise Exception("Invalid observation mode, must be one of " + ", ".join(self.OBSERVATION_MODES))
+        self.observation_mode = observation_mode
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+        self.grid_size = tuple(grid_size or SnakeEnvironment.GRID_SIZE)
+        if not all(SnakeEnvironment.MIN_GRID_SIZE <= side <= SnakeEnvironment.MAX_GRID_SIZE for side in self.grid_size):
+            raise Exception(
+                f"Invalid grid size, sides must be {SnakeEnvironment.MIN_GRID_SIZE}-{SnakeEnvironment.MAX_GRID_SIZE} cells"
+            )
+        self._width, self._height = self.grid_size
+        self.start_cell = ((self._width - 1) // 2, (self._height - 1) // 2)
+        self._cells = self._width * self._height
+        self._capacity = min(self._cells, self.BODY_CAPACITY)
+        self._rows = np.arange(num_envs)
+
+        self.head_x = np.zeros(num_envs, dtype=np.int32)
+        self.head_y = np.zeros(num_envs, dtype=np.int32)
+        self.food_x = np.zeros(num_envs, dtype=np.int32)
+        self.food_y = np.zeros(num_envs, dtype=np.int32)
+        self.scores = np.zeros(num_envs, dtype=np.int32)
+        # score of every game at the moment it ended, valid where the last step returned done
+        self.final_scores = np.zeros(num_envs, dtype=np.int32)
+        # same layout as SnakeEnvironment: one ring buffer of cell indices per game, and a
+        # bitboard of the body cells (bit cell & 7 of byte cell >> 3) with the counts of the
+        # few cells holding more than one piece in _stacked, keyed row * cells + cell.
+        # Every move pushes the old head cell, with or without a body, so until an episode
+        # made more moves than the ring holds, the ring is the list of cells it visited.
+        self._body = np.zeros((num_envs, self._capacity), dtype=np.int32)
+        self._body_start = np.zeros(num_envs, dtype=np.int32)
+        self._moves = np.zeros(num_envs, dtype=np.int64)
+        # games whose visited cells no longer all fit in the ring
+        self._path_lost = np.zeros(num_envs, dtype=bool)
+        self._occupancy = np.zeros((num_envs, (self._cells + 7) >> 3), dtype=np.uint8)
+        self._stacked = {}
+        # per game swap-remove array of empty cells, see SnakeEnvironment._free
+        self._free = np.tile(np.arange(self._cells, dtype=np.int32), (num_envs, 1))
+        self._free_index = self._free.copy()
+        self._free_count = np.full(num_envs, self._cells, dtype=np.int32)
+        # action masks of the current states by lookahead, emptied on every step and reset
+        self._masks = {}
+        # cells the lookahead flood fills have visited, one bit per move, all zero between
+        # calls. Only allocated once a lookahead is asked for.
+        self._seen = None
+        self._grid = None
+        if observation_mode == "grid":
+            self._grid = np.zeros((num_envs, 3, self._height, self._width), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self._reset_envs(self._rows)
+        self._masks = {}
+        return self._build_observations()
+
+    def reset_games(self, rows) -> np.ndarray:
+        """Starts the given games over (say to cut off a game that went on too long), returns
+        the observations of the whole batch"""
+        self._reset_envs(np.unique(np.asarray(rows, dtype=np.intp)))
+        self._masks = {}
+        return self._build_observations()
+
+    def action_masks(self, lookahead: int = 0) -> np.ndarray:
+        """(N, 4) bool, batched SnakeEnvironment.action_mask. The array is cached and returned
+        again until the next step, copy it before changing it."""
+        masks = self._masks.get(lookahead)
+        if masks is None:
+            masks = self._safe_masks()
+            if lookahead > 0:
+                masks = self._roomy_masks(masks, lookahead)
+            self._masks[lookahead] = masks
+        return masks
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.intp)
+        if actions.shape != (self.num_envs,) or ((actions < 0) | (actions > 3)).any():
+            raise Exception("Invalid direction, must be an int 0-3")
+
+        new_x = self.head_x + self.DX[actions]
+        new_y = self.head_y + self.DY[actions]
+
+        # eat
+        ate = (new_x == self.food_x) & (new_y == self.food_y)
+        rewards = ate.astype(np.int32)
+        self.scores += rewards
+
+        # out of bounds, these heads stay where they were
+        dones = (new_x < 0) | (new_x >= self._width) | (new_y < 0) | (new_y >= self._height)
+        alive = np.flatnonzero(~dones)
+        self._move_bodies(alive, new_x[alive], new_y[alive], ate[alive], dones)
+        eaten = np.flatnonzero(ate & ~dones)
+        if eaten.size:
+            self._place_food(eaten)
+
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            self.final_scores[finished] = self.scores[finished]
+            self._reset_envs(finished)
+        self._masks = {}
+        return (self._build_observations(), rewards, dones)
+
+    def _move_bodies(self, rows, new_x, new_y, grew, dones):
+        if self.scores[rows].max(initial=0) > self._capacity:
+            self._grow_bodies()
+        cap = self._capacity
+        new_cell = new_y * self._width + new_x
+        start = self._body_start[rows]
+        scores = self.scores[rows]
+        lengths = scores - grew
+
+        # running into any piece but the first one (the old tail included) is a loss
+        hits = self._counts(rows, new_cell)
+        hits -= self._body[rows, start] == new_cell
+        dones[rows] = (lengths > 1) & (hits > 0)
+
+        # shift: the tail leaves unless the snake grew, the old head becomes the first piece
+        has_body = scores >= 1
+        shrink = has_body & ~grew
+        tail_rows = rows[shrink]
+        tail_cells = self._body[tail_rows, (start[shrink] + lengths[shrink] - 1) % cap]
+        # after a reversal into the neck the tail can be where the head was, which the
+        # push below takes again
+        head_cells = self.head_y[tail_rows] * self._width + self.head_x[tail_rows]
+        emptied = self._vacate(tail_rows, tail_cells) & (tail_cells != head_cells)
+        self._free_add(tail_rows[emptied], tail_cells[emptied])
+
+        push_start = (start - 1) % cap
+        prev_cells = self.head_y[rows] * self._width + self.head_x[rows]
+        self._body_start[rows] = push_start
+        self._body[rows, push_start] = prev_cells
+        self._moves[rows] += 1
+        self._occupy(rows[has_body], prev_cells[has_body])
+        bare = ~has_body
+        self._free_add(rows[bare], prev_cells[bare])
+
+        self.head_x[rows] = new_x
+        self.head_y[rows] = new_y
+        self._free_remove(rows, new_cell)
+
+    def _reset_envs(self, rows):
+        """Empties the boards of rows and puts their free cells back in order, only undoing
+        what the episodes changed, like SnakeEnvironment._clear_board. Free list writes only
+        ever land on cells the head visited or on slots past the lowest free count, so those
+        are set back to their starting values. A game whose visited cells dropped out of its
+        ring gets its whole free list copied back."""
+        cap, cells = self._capacity, self._cells
+        starts, scores = self._body_start[rows], self.scores[rows]
+        # every byte holding a body cell, nothing else has a bit set
+        body_rows, body_cells = self._ring_cells(rows, starts, scores)
+        self._occupancy[body_rows, body_cells >> 3] = 0
+        if self._stacked:
+            resetting = set((rows.astype(np.int64) * cells).tolist())
+            for key in [key for key in self._stacked if key - key % cells in resetting]:
+                del self._stacked[key]
+
+        lost = self._path_lost[rows] | (self._moves[rows] > cap)
+        full = rows[lost]
+        if full.size:
+            self._free[full] = np.arange(cells)
+            self._free_index[full] = np.arange(cells)
+        kept = ~lost
+        path_rows, path_cells = self._ring_cells(rows[kept], starts[kept], self._moves[rows][kept])
+        heads = self.head_y[rows[kept]] * self._width + self.head_x[rows[kept]]
+        # slots from the lowest free count on, at most score + 1 cells were ever taken
+        lows = np.maximum(cells - scores[kept].astype(np.int64) - 2, 0)
+        tail_rows = np.repeat(rows[kept], cells - lows)
+        tail_slots = _ranges(lows, cells - lows)
+        touched_rows = np.concatenate([path_rows, rows[kept], tail_rows])
+        touched = np.concatenate([path_cells, heads, tail_slots]).astype(np.int32)
+        self._free[touched_rows, touched] = touched
+        self._free_index[touched_rows, touched] = touched
+        self._free_count[rows] = cells
+
+        self.scores[rows] = 0
+        self._body_start[rows] = 0
+        self._moves[rows] = 0
+        self._path_lost[rows] = False
+        self.head_x[rows], self.head_y[rows] = self.start_cell
+        start_x, start_y = self.start_cell
+        self._free_remove(rows, np.full(len(rows), start_y * self._width + start_x))
+        self._place_food(rows)
+
+    def _place_food(self, rows):
+        counts = self._free_count[rows]
+        picks = (self.rng.random(len(rows)) * counts).astype(np.int32)
+        cells = self._free[rows, np.minimum(picks, self._cells - 1)]
+        full = counts == 0
+        self.food_x[rows] = np.where(full, -1, cells % self._width)
+        self.food_y[rows] = np.where(full, -1, cells // self._width)
+
+    # rows passed to _free_add and _free_remove must be unique
+    def _free_add(self, rows, cells):
+        taken = self._free_index[rows, cells] < 0
+        rows, cells = rows[taken], cells[taken]
+        counts = self._free_count[rows]
+        self._free[rows, counts] = cells
+        self._free_index[rows, cells] = counts
+        self._free_count[rows] = counts + 1
+
+    def _free_remove(self, rows, cells):
+        slots = self._free_index[rows, cells]
+        free = slots >= 0
+        rows, cells, slots = rows[free], cells[free], slots[free]
+        counts = self._free_count[rows] - 1
+        last = self._free[rows, counts]
+        self._free[rows, slots] = last
+        self._free_index[rows, last] = slots
+        self._free_index[rows, cells] = -1
+        self._free_count[rows] = counts
+
+    def _grow_bodies(self):
+        cap = self._capacity
+        order = (self._body_start[:, None] + np.arange(cap)) % cap
+        body = np.take_along_axis(self._body, order, axis=1)
+        # the pushes that were overwritten stay lost in the bigger ring
+        self._path_lost |= self._moves > cap
+        self._capacity *= 2
+        self._body = np.concatenate([body, np.zeros_like(body)], axis=1)
+        self._body_start[:] = 0
+
+    def _ring_cells(self, rows, starts, lengths):
+        """(row, cell) of the first lengths entries of each ring from its start, flattened"""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        flat_rows = np.repeat(rows, lengths)
+        return flat_rows, self._body[flat_rows, _ranges(starts, lengths) % self._capacity]
+
+    def _bits(self, rows, cells) -> np.ndarray:
+        return self._occupancy[rows, cells >> 3] >> (cells & 7).astype(np.uint8) & 1
+
+    def _counts(self, rows, cells) -> np.ndarray:
+        """Body pieces on each (row, cell)"""
+        counts = self._bits(rows, cells).astype(np.int32)
+        if self._stacked:
+            keys = rows.astype(np.int64) * self._cells + cells
+            for i in np.flatnonzero(np.isin(keys, np.fromiter(self._stacked, dtype=np.int64))):
+                counts[i] = self._stacked[int(keys[i])]
+        return counts
+
+    # rows passed to _occupy and _vacate must be unique
+    def _occupy(self, rows, cells):
+        taken = self._bits(rows, cells) == 1
+        for key in (rows[taken].astype(np.int64) * self._cells + cells[taken]).tolist():
+            self._stacked[key] = self._stacked.get(key, 1) + 1
+        self._occupancy[rows, cells >> 3] |= (1 << (cells & 7)).astype(np.uint8)
+
+    def _vacate(self, rows, cells) -> np.ndarray:
+        """Takes one piece off each (row, cell), returns which cells are empty now"""
+        emptied = np.ones(len(rows), dtype=bool)
+        if self._stacked:
+            keys = rows.astype(np.int64) * self._cells + cells
+            for i in np.flatnonzero(np.isin(keys, np.fromiter(self._stacked, dtype=np.int64))):
+                key = int(keys[i])
+                emptied[i] = False
+                if self._stacked[key] == 2:
+                    del self._stacked[key]
+                else:
+                    self._stacked[key] -= 1
+        rows, cells = rows[emptied], cells[emptied]
+        self._occupancy[rows, cells >> 3] &= ~(1 << (cells & 7)).astype(np.uint8)
+        return emptied
+
+    def _neighbours(self):
+        """(edge, neighbour cell) of every head going up / right / left / down, the head's own
+        cell stands in where the edge is in the way"""
+        width, height = self._width, self._height
+        x, y = self.head_x, self.head_y
+        cell = y * width + x
+        for edge, offset in ((y == 0, -width), (x == width - 1, 1), (x == 0, -1), (y == height - 1, width)):
+            yield edge, np.where(edge, cell, cell + offset)
+
+    def _safe_masks(self) -> np.ndarray:
+        masks = np.empty((self.num_envs, 4), dtype=bool)
+        for i, (edge, neighbour) in enumerate(self._neighbours()):
+            masks[:, i] = ~edge & (self._bits(self._rows, neighbour) == 0)
+        return masks
+
+    def _roomy_masks(self, masks: np.ndarray, lookahead: int) -> np.ndarray:
+        """Bounded flood fill of SnakeEnvironment._region_size for every safe move at once.
+        The fills advance one level per pass and only expand their frontier, each stops once
+        it counted need cells, so the work follows the cells visited and not the board size."""
+        width, cells = self._width, self._cells
+        rows = self._rows
+        heads = self.head_y * width + self.head_x
+        tails = self._body[rows, (self._body_start + self.scores - 1) % self._capacity]
+        foods = np.where(self.food_x >= 0, self.food_y * width + self.food_x, -1)
+        # the tail leaves on the move unless the snake eats or pieces are stacked there
+        tail_leaves = (self.scores > 0) & (self._counts(rows, tails) == 1)
+
+        env_rows, actions = np.nonzero(masks)
+        targets = np.stack([cell for _, cell in self._neighbours()], axis=1)[env_rows, actions]
+        free_tails = np.where(tail_leaves[env_rows] & (targets != foods[env_rows]), tails[env_rows], -1)
+        need = np.minimum(lookahead, self.scores + 1)[env_rows]
+        bits = (1 << actions).astype(np.uint8)
+        sizes = np.ones(len(env_rows), dtype=np.int64)
+
+        if self._seen is None:
+            self._seen = np.zeros((self.num_envs, cells), dtype=np.uint8)
+        seen = self._seen
+        # the head cell turns into body, it is never part of a region
+        visited_rows, visited_cells = [env_rows, env_rows], [heads[env_rows], targets]
+        np.bitwise_or.at(seen, (env_rows, heads[env_rows]), bits)
+        np.bitwise_or.at(seen, (env_rows, targets), bits)
+
+        fills = np.flatnonzero(sizes < need)
+        frontier = targets[fills]
+        while fills.size:
+            x = frontier % width
+            steps = (
+                (frontier - width, frontier >= width), (frontier + 1, x < width - 1),
+                (frontier - 1, x > 0), (frontier + width, frontier < cells - width),
+            )
+            fill = np.concatenate([fills[inside] for _, inside in steps])
+            cell = np.concatenate([neighbour[inside] for neighbour, inside in steps])
+            row = env_rows[fill]
+            new = ((seen[row, cell] & bits[fill]) == 0) & ((self._bits(row, cell) == 0) | (cell == free_tails[fill]))
+            # a cell next to two frontier cells of one fill counts once
+            keys = np.unique(fill[new] * cells + cell[new])
+            fill, cell = keys // cells, keys % cells
+            row = env_rows[fill]
+            np.bitwise_or.at(seen, (row, cell), bits[fill])
+            visited_rows.append(row)
+            visited_cells.append(cell)
+            sizes += np.bincount(fill, minlength=len(sizes))
+            growing = sizes[fill] < need[fill]
+            fills, frontier = fill[growing], cell[growing]
+        seen[np.concatenate(visited_rows), np.concatenate(visited_cells)] = 0
+
+        roomy = masks.copy()
+        trapped = sizes < need
+        roomy[env_rows[trapped], actions[trapped]] = False
+        # games where every safe move is a trap keep their plain mask
+        return np.where(roomy.any(axis=1, keepdims=True), roomy, masks)
+
+    def _build_observations(self) -> np.ndarray:
+        """Batched SnakeEnvironment._build_observation, one row per game"""
+        if self._grid is not None:
+            return self._build_grid_observations()
+        width, height = self._width, self._height
+        rows = self._rows
+        x, y = self.head_x, self.head_y
+        cell = y * width + x
+        observations = np.empty((self.num_envs, SnakeEnvironment.OBSERVATION_SIZE), dtype=np.float32)
+
+        # blocked going up / right / left / down, a wall or any body piece next to the head
+        for i, (edge, neighbour) in enumerate(self._neighbours()):
+            observations[:, i] = edge | (self._bits(rows, neighbour) > 0)
+
+        half_x, half_y = (width - 1) / 2, (height - 1) / 2
+        span_x, span_y = width - 1, height - 1
+        has_body = self.scores > 0
+        start = self._body_start
+        tail = np.where(has_body, self._body[rows, (start + self.scores - 1) % self._capacity], cell)
+        center = np.where(has_body, self._body[rows, (start + self.scores // 2) % self._capacity], cell)
+        observations[:, 4] = (x - half_x) / half_x
+        observations[:, 5] = (y - half_y) / half_y
+        observations[:, 6] = (self.food_x - x) / span_x
+        observations[:, 7] = (self.food_y - y) / span_y
+        observations[:, 8] = (tail % width - x) / span_x
+        observations[:, 9] = (tail // width - y) / span_y
+        observations[:, 10] = (center % width - x) / span_x
+        observations[:, 11] = (center // width - y) / span_y
+        return observations
+
+    def _build_grid_observations(self) -> np.ndarray:
+        grid = self._grid
+        rows = self._rows
+        body = np.unpackbits(self._occupancy, axis=1, count=self._cells, bitorder="little")
+        grid[:, 0] = body.reshape(self.num_envs, self._height, self._width)
+        grid[:, 1:] = 0
+        grid[rows, 1, self.head_y, self.head_x] = 1
+        placed = self.food_x >= 0
+        grid[rows[placed], 2, self.food_y[placed], self.food_x[placed]] = 1
+        return grid